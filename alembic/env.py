@@ -16,8 +16,12 @@ if config.config_file_name is not None:
 # import models so SQLAlchemy registers them on Base.metadata
 from app.models.base import Base  # noqa: E402
 import app.models.action_log  # noqa: F401,E402
+import app.models.analysis_job  # noqa: F401,E402
+import app.models.archived_note  # noqa: F401,E402
+import app.models.llm_cache  # noqa: F401,E402
 import app.models.note  # noqa: F401,E402
 import app.models.todo_list  # noqa: F401,E402
+import app.models.tombstone  # noqa: F401,E402
 import app.models.user  # noqa: F401,E402
 
 target_metadata = Base.metadata
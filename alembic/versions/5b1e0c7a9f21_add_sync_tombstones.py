@@ -0,0 +1,44 @@
+"""Add tombstones table and updated_at indexes for delta sync.
+
+Revision ID: 5b1e0c7a9f21
+Revises: d3cf938a6938
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "5b1e0c7a9f21"
+down_revision = "d3cf938a6938"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tombstones",
+        sa.Column("entity_type", sa.Text(), primary_key=True),
+        sa.Column("entity_id", sa.BigInteger(), primary_key=True),
+        sa.Column(
+            "user_id",
+            sa.BigInteger(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "deleted_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_tombstones_user_deleted", "tombstones", ["user_id", "deleted_at"])
+    op.create_index("ix_notes_user_updated", "notes", ["user_id", "updated_at"])
+    op.create_index("ix_todo_lists_user_updated", "todo_lists", ["user_id", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_todo_lists_user_updated", table_name="todo_lists")
+    op.drop_index("ix_notes_user_updated", table_name="notes")
+    op.drop_index("ix_tombstones_user_deleted", table_name="tombstones")
+    op.drop_table("tombstones")
@@ -0,0 +1,31 @@
+"""Add persistent LLM result cache.
+
+Revision ID: 6f2b8d4e1c93
+Revises: 3e7a9b2c5d14
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "6f2b8d4e1c93"
+down_revision = "3e7a9b2c5d14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_cache",
+        sa.Column("key", sa.Text(), primary_key=True),
+        sa.Column("result", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_llm_cache_expires", "llm_cache", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_cache_expires", table_name="llm_cache")
+    op.drop_table("llm_cache")
@@ -0,0 +1,42 @@
+"""Add tile grid key columns and index to notes for viewport queries.
+
+Revision ID: 8c4d2e6f1a37
+Revises: 5b1e0c7a9f21
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "8c4d2e6f1a37"
+down_revision = "5b1e0c7a9f21"
+branch_labels = None
+depends_on = None
+
+BOARD_TILE_SIZE = 1024
+
+
+def upgrade() -> None:
+    op.add_column(
+        "notes",
+        sa.Column(
+            "tile_x",
+            sa.Integer(),
+            sa.Computed(f"floor(pos_x / {BOARD_TILE_SIZE})::integer", persisted=True),
+        ),
+    )
+    op.add_column(
+        "notes",
+        sa.Column(
+            "tile_y",
+            sa.Integer(),
+            sa.Computed(f"floor(pos_y / {BOARD_TILE_SIZE})::integer", persisted=True),
+        ),
+    )
+    op.create_index("ix_notes_user_tile", "notes", ["user_id", "tile_x", "tile_y"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_user_tile", table_name="notes")
+    op.drop_column("notes", "tile_y")
+    op.drop_column("notes", "tile_x")
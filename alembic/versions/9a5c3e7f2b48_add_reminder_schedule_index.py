@@ -0,0 +1,43 @@
+"""Add pending time reminder index and fired marker to notes.
+
+Revision ID: 9a5c3e7f2b48
+Revises: 6f2b8d4e1c93
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "9a5c3e7f2b48"
+down_revision = "6f2b8d4e1c93"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("notes", sa.Column("notified_for", sa.Text(), nullable=True))
+    # The scheduler compares reminder times as text; store them as UTC ISO
+    # strings like the API does from now on.
+    op.execute(
+        """
+        UPDATE notes
+        SET notify_value = jsonb_set(
+            notify_value,
+            '{at}',
+            to_jsonb(to_char((notify_value ->> 'at')::timestamptz AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24\\:MI\\:SS.MS"Z"'))
+        )
+        WHERE notify_by = 'time'
+          AND notify_value ->> 'at' ~ '^\\d{4}-\\d{2}-\\d{2}'
+        """
+    )
+    op.create_index(
+        "ix_notes_notify_at",
+        "notes",
+        [sa.text("(notify_value ->> 'at')")],
+        postgresql_where=sa.text("notify_by = 'time' AND NOT is_done"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_notify_at", table_name="notes")
+    op.drop_column("notes", "notified_for")
@@ -0,0 +1,57 @@
+"""Add geofence grid cell columns and index to notes.
+
+Revision ID: b4d8f1a6c2e7
+Revises: 9a5c3e7f2b48
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b4d8f1a6c2e7"
+down_revision = "9a5c3e7f2b48"
+branch_labels = None
+depends_on = None
+
+GEOFENCE_CELL_DEG = 0.02
+
+
+def _geofence_cell(axis: str) -> sa.Computed:
+    point = f"coalesce((notify_value ->> '{axis}')::float8, (geo ->> '{axis}')::float8)"
+    return sa.Computed(
+        f"CASE WHEN notify_by = 'location' THEN floor({point} / {GEOFENCE_CELL_DEG})::integer END",
+        persisted=True,
+    )
+
+
+# Plain decimals only: anything else (text, exponents, NaN, nested JSON)
+# would make the generated columns fail to cast.
+COORDINATE_PATTERN = r"^\s*[-+]?([0-9]{1,3}(\.[0-9]*)?|\.[0-9]+)\s*$"
+COORDINATE_LIMITS = {"lat": 90, "lon": 180}
+
+
+def upgrade() -> None:
+    for column in ("notify_value", "geo"):
+        for axis, limit in COORDINATE_LIMITS.items():
+            value = f"({column} ->> '{axis}')"
+            op.execute(
+                sa.text(
+                    f"UPDATE notes SET {column} = {column} - '{axis}' "
+                    f"WHERE jsonb_typeof({column}) = 'object' AND {column} ? '{axis}' "
+                    f"AND NOT CASE WHEN {value} ~ :pattern THEN abs({value}::float8) <= {limit} ELSE false END"
+                ).bindparams(pattern=COORDINATE_PATTERN)
+            )
+    op.add_column("notes", sa.Column("geo_cell_x", sa.Integer(), _geofence_cell("lon")))
+    op.add_column("notes", sa.Column("geo_cell_y", sa.Integer(), _geofence_cell("lat")))
+    op.create_index(
+        "ix_notes_user_geofence_cell",
+        "notes",
+        ["user_id", "geo_cell_y", "geo_cell_x"],
+        postgresql_where=sa.text("notify_by = 'location' AND NOT is_done"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_user_geofence_cell", table_name="notes")
+    op.drop_column("notes", "geo_cell_y")
+    op.drop_column("notes", "geo_cell_x")
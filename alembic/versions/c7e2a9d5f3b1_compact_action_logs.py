@@ -0,0 +1,24 @@
+"""Add action log retention depth and per-user index.
+
+Revision ID: c7e2a9d5f3b1
+Revises: b4d8f1a6c2e7
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c7e2a9d5f3b1"
+down_revision = "b4d8f1a6c2e7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("action_log_depth", sa.Integer(), nullable=True))
+    op.create_index("ix_action_logs_user_id", "action_logs", ["user_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_action_logs_user_id", table_name="action_logs")
+    op.drop_column("users", "action_log_depth")
@@ -0,0 +1,54 @@
+"""Add per-user undo head pointer and action log parent links.
+
+Revision ID: d1f6b3a8e5c2
+Revises: c7e2a9d5f3b1
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d1f6b3a8e5c2"
+down_revision = "c7e2a9d5f3b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("undo_head_id", sa.BigInteger(), nullable=True))
+    op.add_column("action_logs", sa.Column("prev_id", sa.BigInteger(), nullable=True))
+    # History used to be linear with the redo stack on top (redo entries
+    # were deleted on every write), so each entry's parent is simply the
+    # previous entry of the same user.
+    op.execute(
+        """
+        UPDATE action_logs a
+        SET prev_id = p.prev_id
+        FROM (
+            SELECT id, lag(id) OVER (PARTITION BY user_id ORDER BY id) AS prev_id
+            FROM action_logs
+        ) p
+        WHERE a.id = p.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE users u
+        SET undo_head_id = (
+            SELECT max(id) FROM action_logs a
+            WHERE a.user_id = u.id AND a.undone_at IS NULL
+        )
+        """
+    )
+    op.create_index(
+        "ix_action_logs_redo",
+        "action_logs",
+        ["user_id", "prev_id", "id"],
+        postgresql_where=sa.text("undone_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_action_logs_redo", table_name="action_logs")
+    op.drop_column("action_logs", "prev_id")
+    op.drop_column("users", "undo_head_id")
@@ -0,0 +1,43 @@
+"""Add full-text and trigram search indexes to notes.
+
+Revision ID: e8a3c6f1d2b9
+Revises: d1f6b3a8e5c2
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "e8a3c6f1d2b9"
+down_revision = "d1f6b3a8e5c2"
+branch_labels = None
+depends_on = None
+
+SEARCH_CONFIGS = ("russian", "english")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "notes",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(" || ".join(f"to_tsvector('{c}'::regconfig, text)" for c in SEARCH_CONFIGS), persisted=True),
+        ),
+    )
+    op.create_index("ix_notes_search", "notes", ["search_vector"], postgresql_using="gin")
+    op.create_index(
+        "ix_notes_text_trgm",
+        "notes",
+        ["text"],
+        postgresql_using="gin",
+        postgresql_ops={"text": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_text_trgm", table_name="notes")
+    op.drop_index("ix_notes_search", table_name="notes")
+    op.drop_column("notes", "search_vector")
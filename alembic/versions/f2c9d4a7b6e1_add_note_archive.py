@@ -0,0 +1,63 @@
+"""Add archived_notes and partial indexes for active and done notes.
+
+Revision ID: f2c9d4a7b6e1
+Revises: e8a3c6f1d2b9
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "f2c9d4a7b6e1"
+down_revision = "e8a3c6f1d2b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "archived_notes",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("device", sa.Text(), nullable=True),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("geo", postgresql.JSONB(), nullable=True),
+        sa.Column("todo_list_id", sa.BigInteger(), nullable=True),
+        sa.Column("pos_x", sa.Float(), nullable=False),
+        sa.Column("pos_y", sa.Float(), nullable=False),
+        sa.Column("is_processed_by_llm", sa.Boolean(), nullable=False),
+        sa.Column(
+            "notify_by",
+            postgresql.ENUM("time", "location", name="notify_by_enum", create_type=False),
+            nullable=True,
+        ),
+        sa.Column("notify_value", postgresql.JSONB(), nullable=True),
+        sa.Column("notified_for", sa.Text(), nullable=True),
+        sa.Column(
+            "severity",
+            postgresql.ENUM("low", "normal", "high", name="severity_enum", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("tag", sa.Text(), nullable=True),
+        sa.Column("is_done", sa.Boolean(), nullable=False),
+        sa.Column("meta", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_archived_notes_user_id", "archived_notes", ["user_id", "id"])
+    op.create_index(
+        "ix_notes_user_active_created",
+        "notes",
+        ["user_id", "created_at"],
+        postgresql_where=sa.text("NOT is_done"),
+    )
+    op.create_index("ix_notes_done_updated", "notes", ["updated_at"], postgresql_where=sa.text("is_done"))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_done_updated", table_name="notes")
+    op.drop_index("ix_notes_user_active_created", table_name="notes")
+    op.drop_index("ix_archived_notes_user_id", table_name="archived_notes")
+    op.drop_table("archived_notes")
@@ -1,21 +1,66 @@
-from fastapi import FastAPI
+import json
 
-from app.db import ensure_triggers, engine
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+
+from app.db import ensure_search_indexes, ensure_triggers, engine
 from app.models.base import Base
 import app.models.action_log  # noqa: F401
+import app.models.analysis_job  # noqa: F401
+import app.models.archived_note  # noqa: F401
+import app.models.llm_cache  # noqa: F401
+import app.models.tombstone  # noqa: F401
 from app.routers.board import router as board_router
+from app.routers.metrics import router as metrics_router
 from app.routers.notes import router as notes_router
+from app.services.analysis_worker import ANALYSIS_WORKER, analysis_worker
+from app.services.board_events import board_events
+from app.services.geometry_buffer import GEOMETRY_WRITE_BEHIND, geometry_buffer
+from app.services.maintenance import maintenance
+from app.services.metrics import MetricsMiddleware
+from app.services.reminder_scheduler import REMINDER_SCHEDULER, reminder_scheduler
 
 app = FastAPI(title="Notes Board")
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # NaN/Infinity inputs are rejected but can't be echoed back as JSON.
+    errors = jsonable_encoder(exc.errors())
+    try:
+        body = json.dumps({"detail": errors}, allow_nan=False)
+    except ValueError:
+        body = json.dumps({"detail": [{k: v for k, v in e.items() if k != "input"} for e in errors]})
+    return Response(content=body, status_code=422, media_type="application/json")
 
 @app.on_event("startup")
 async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
         await ensure_triggers(conn)
+        await ensure_search_indexes(conn)
+    await board_events.start()
+    await maintenance.start()
+    if ANALYSIS_WORKER:
+        await analysis_worker.start()
+    if REMINDER_SCHEDULER:
+        await reminder_scheduler.start()
+    if GEOMETRY_WRITE_BEHIND:
+        await geometry_buffer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await geometry_buffer.stop()
+    await reminder_scheduler.stop()
+    await analysis_worker.stop()
+    await maintenance.stop()
+    await board_events.stop()
 
 app.include_router(notes_router)
 app.include_router(board_router)
+app.include_router(metrics_router)
 
 if __name__=='__main__':
     import uvicorn
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, DateTime, ForeignKey, Text, func
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Text, func, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -7,9 +7,22 @@ from .base import Base
 
 class ActionLog(Base):
     __tablename__ = "action_logs"
+    __table_args__ = (
+        Index("ix_action_logs_user_id", "user_id", "id"),
+        Index(
+            "ix_action_logs_redo",
+            "user_id",
+            "prev_id",
+            "id",
+            postgresql_where=text("undone_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # The user's undo head when this entry was written. No foreign key:
+    # compaction may remove the parent.
+    prev_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
     action_type: Mapped[str] = mapped_column(Text, nullable=False)
     entity_type: Mapped[str] = mapped_column(Text, nullable=False)
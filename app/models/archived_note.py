@@ -0,0 +1,37 @@
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, ForeignKey, Index, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+from .note import NotifyByEnum, SeverityEnum
+
+
+# Done notes moved out of the hot notes table by the archiver. Rows keep
+# their note id and every stored column; list ids are kept as they were.
+class ArchivedNote(Base):
+    __tablename__ = "archived_notes"
+    __table_args__ = (
+        Index("ix_archived_notes_user_id", "user_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    device: Mapped[str | None] = mapped_column(Text, nullable=True)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    geo: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    todo_list_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    pos_x: Mapped[float] = mapped_column(Float, nullable=False)
+    pos_y: Mapped[float] = mapped_column(Float, nullable=False)
+    is_processed_by_llm: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    notify_by: Mapped[str | None] = mapped_column(NotifyByEnum, nullable=True)
+    notify_value: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    notified_for: Mapped[str | None] = mapped_column(Text, nullable=True)
+    severity: Mapped[str] = mapped_column(SeverityEnum, nullable=False)
+    tag: Mapped[str | None] = mapped_column(Text, nullable=True)
+    is_done: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    meta: Mapped[dict] = mapped_column(JSONB, nullable=False)
+
+    created_at: Mapped[object] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[object] = mapped_column(DateTime(timezone=True), nullable=False)
+    archived_at: Mapped[object] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
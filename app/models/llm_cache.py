@@ -0,0 +1,17 @@
+from sqlalchemy import DateTime, Index, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class LlmCacheEntry(Base):
+    __tablename__ = "llm_cache"
+    __table_args__ = (
+        Index("ix_llm_cache_expires", "expires_at"),
+    )
+
+    key: Mapped[str] = mapped_column(Text, primary_key=True)
+    result: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[object] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at: Mapped[object] = mapped_column(DateTime(timezone=True), nullable=False)
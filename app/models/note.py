@@ -1,5 +1,5 @@
-from sqlalchemy import BigInteger, Boolean, DateTime, Enum, Float, ForeignKey, Index, Text, func
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import BigInteger, Boolean, Computed, DateTime, Enum, Float, ForeignKey, Index, Integer, Text, func, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
@@ -7,12 +7,48 @@ from .base import Base
 SeverityEnum = Enum("low", "normal", "high", name="severity_enum")
 NotifyByEnum = Enum("time", "location", name="notify_by_enum")
 
+BOARD_TILE_SIZE = 1024
+# Board coordinates are kept well inside the integer range of the tile
+# columns; the API rejects anything outside it.
+BOARD_COORD_LIMIT = 1e9
+# Geofence grid cell edge in degrees (~2.2 km of latitude).
+GEOFENCE_CELL_DEG = 0.02
+# List titles are Russian and note text mixes both languages.
+SEARCH_CONFIGS = ("russian", "english")
+
+
+def _geofence_cell(axis: str) -> Computed:
+    point = f"coalesce((notify_value ->> '{axis}')::float8, (geo ->> '{axis}')::float8)"
+    return Computed(
+        f"CASE WHEN notify_by = 'location' THEN floor({point} / {GEOFENCE_CELL_DEG})::integer END",
+        persisted=True,
+    )
+
 
 class Note(Base):
     __tablename__ = "notes"
     __table_args__ = (
         Index("ix_notes_user_created", "user_id", "created_at"),
+        # Boards fill their note cap from active notes first.
+        Index("ix_notes_user_active_created", "user_id", "created_at", postgresql_where=text("NOT is_done")),
+        # The archiver's scan for done notes past NOTE_ARCHIVE_AFTER_DAYS.
+        Index("ix_notes_done_updated", "updated_at", postgresql_where=text("is_done")),
         Index("ix_notes_user_list", "user_id", "todo_list_id"),
+        Index("ix_notes_user_updated", "user_id", "updated_at"),
+        Index("ix_notes_user_tile", "user_id", "tile_x", "tile_y"),
+        Index(
+            "ix_notes_notify_at",
+            text("(notify_value ->> 'at')"),
+            postgresql_where=text("notify_by = 'time' AND NOT is_done"),
+        ),
+        Index(
+            "ix_notes_user_geofence_cell",
+            "user_id",
+            "geo_cell_y",
+            "geo_cell_x",
+            postgresql_where=text("notify_by = 'location' AND NOT is_done"),
+        ),
+        Index("ix_notes_search", "search_vector", postgresql_using="gin"),
         Index(
             "ix_notes_geo_gin",
             "geo",
@@ -26,16 +62,28 @@ class Note(Base):
 
     device: Mapped[str | None] = mapped_column(Text, nullable=True)
     text: Mapped[str] = mapped_column(Text, nullable=False)
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(" || ".join(f"to_tsvector('{c}'::regconfig, text)" for c in SEARCH_CONFIGS), persisted=True),
+        deferred=True,
+    )
     geo: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
 
     todo_list_id: Mapped[int | None] = mapped_column(BigInteger, ForeignKey("todo_lists.id", ondelete="SET NULL"), nullable=True)
 
     pos_x: Mapped[float] = mapped_column(Float, nullable=False, server_default="0")
     pos_y: Mapped[float] = mapped_column(Float, nullable=False, server_default="0")
+    tile_x: Mapped[int] = mapped_column(Integer, Computed(f"floor(pos_x / {BOARD_TILE_SIZE})::integer", persisted=True))
+    tile_y: Mapped[int] = mapped_column(Integer, Computed(f"floor(pos_y / {BOARD_TILE_SIZE})::integer", persisted=True))
 
     is_processed_by_llm: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
     notify_by: Mapped[str | None] = mapped_column(NotifyByEnum, nullable=True)
     notify_value: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    geo_cell_x: Mapped[int | None] = mapped_column(Integer, _geofence_cell("lon"))
+    geo_cell_y: Mapped[int | None] = mapped_column(Integer, _geofence_cell("lat"))
+    # notify_value["at"] of the time reminder that already fired, or
+    # "inside" while the user is within a location reminder's radius.
+    notified_for: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     severity: Mapped[str] = mapped_column(SeverityEnum, nullable=False, server_default="normal")
     tag: Mapped[str | None] = mapped_column(Text, nullable=True)
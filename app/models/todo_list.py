@@ -8,6 +8,7 @@ class TodoList(Base):
     __tablename__ = "todo_lists"
     __table_args__ = (
         Index("ix_todo_lists_user", "user_id"),
+        Index("ix_todo_lists_user_updated", "user_id", "updated_at"),
     )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, DateTime, Text, func
+from sqlalchemy import BigInteger, DateTime, Integer, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
@@ -9,4 +9,9 @@ class User(Base):
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_key: Mapped[str] = mapped_column(Text, unique=True, nullable=False)
+    # Undo history kept for this user; NULL means ACTION_LOG_DEPTH.
+    action_log_depth: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Latest applied action_logs entry: undo reverts it, redo replays its
+    # most recent undone child.
+    undo_head_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     created_at: Mapped[object] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
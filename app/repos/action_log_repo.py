@@ -1,19 +1,16 @@
-from sqlalchemy import delete, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import timedelta
+
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy.sql import func
 
 from app.models.action_log import ActionLog
+from app.models.user import User
+from app.repos.copy_repo import CopyRepo, copy_columns
 
 
 class ActionLogRepo:
-    async def clear_redo_for_user(self, db: AsyncSession, user_id: int) -> None:
-        await db.execute(
-            delete(ActionLog)
-            .where(ActionLog.user_id == user_id)
-            .where(ActionLog.undone_at.isnot(None))
-        )
-        await db.commit()
-
     async def create(
         self,
         db: AsyncSession,
@@ -24,51 +21,157 @@ class ActionLogRepo:
         before: dict | None,
         after: dict | None,
     ) -> ActionLog:
-        action = ActionLog(
-            user_id=user_id,
-            action_type=action_type,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            before=before,
-            after=after,
+        # The new entry becomes the user's undo head. Locking the user row
+        # keeps concurrent writes of one user on a single chain; anything
+        # that was undone past the old head simply becomes unreachable.
+        # NO KEY UPDATE because inserting the entity already took a KEY SHARE
+        # lock on the user row; upgrading to FOR UPDATE deadlocks two writers.
+        head = (
+            select(User.undo_head_id)
+            .where(User.id == user_id)
+            .with_for_update(key_share=True)
+            .scalar_subquery()
         )
-        db.add(action)
-        await db.commit()
-        await db.refresh(action)
+        q = await db.execute(
+            insert(ActionLog)
+            .values(
+                user_id=user_id,
+                prev_id=head,
+                action_type=action_type,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                before=before,
+                after=after,
+            )
+            .returning(ActionLog)
+        )
+        action = q.scalar_one()
+        await self.set_head(db, user_id, action.id)
         return action
 
-    async def get_last_undoable(self, db: AsyncSession, user_id: int) -> ActionLog | None:
+    async def create_many(self, db: AsyncSession, rows: list[dict]) -> None:
+        by_user: dict[int, list[dict]] = {}
+        for row in rows:
+            by_user.setdefault(row["user_id"], []).append(row)
+        for user_id, user_rows in by_user.items():
+            q = await db.execute(select(User.undo_head_id).where(User.id == user_id).with_for_update(key_share=True))
+            prev_id = q.scalar_one()
+            chained = []
+            for row, action_id in zip(user_rows, await CopyRepo().reserve_ids(db, ActionLog.__table__, len(user_rows))):
+                chained.append({**row, "id": action_id, "prev_id": prev_id})
+                prev_id = action_id
+            await db.execute(insert(ActionLog.__table__), chained)
+            await self.set_head(db, user_id, prev_id)
+
+    async def get(self, db: AsyncSession, action_id: int | None) -> ActionLog | None:
+        if action_id is None:
+            return None
+        q = await db.execute(select(ActionLog).where(ActionLog.id == action_id))
+        return q.scalar_one_or_none()
+
+    async def get_head(self, db: AsyncSession, user_id: int) -> ActionLog | None:
         q = await db.execute(
-            select(ActionLog)
-            .where(ActionLog.user_id == user_id)
-            .where(ActionLog.undone_at.is_(None))
-            .order_by(ActionLog.id.desc())
-            .limit(1)
+            select(ActionLog).join(User, User.undo_head_id == ActionLog.id).where(User.id == user_id)
         )
         return q.scalar_one_or_none()
 
-    async def get_last_redoable(self, db: AsyncSession, user_id: int) -> ActionLog | None:
+    async def get_redo(self, db: AsyncSession, user_id: int, head_id: int | None) -> ActionLog | None:
+        # The most recent undone child of the head; older undone siblings
+        # are abandoned branches. Served by ix_action_logs_redo.
         q = await db.execute(
             select(ActionLog)
             .where(ActionLog.user_id == user_id)
+            .where(ActionLog.prev_id.is_(None) if head_id is None else ActionLog.prev_id == head_id)
             .where(ActionLog.undone_at.isnot(None))
-            .order_by(ActionLog.undone_at.desc())
+            .order_by(ActionLog.id.desc())
             .limit(1)
         )
         return q.scalar_one_or_none()
 
-    async def mark_undone(self, db: AsyncSession, action_id: int) -> None:
-        await db.execute(
+    async def merge_update(
+        self,
+        db: AsyncSession,
+        action_id: int,
+        before: dict,
+        after: dict,
+        window: timedelta,
+    ) -> bool:
+        # An undone child's before/after were recorded against this entry's
+        # after; rewriting it would make that redo replay a stale state.
+        child = aliased(ActionLog)
+        q = await db.execute(
             update(ActionLog)
             .where(ActionLog.id == action_id)
+            .where(ActionLog.created_at >= func.now() - window)
+            .where(
+                ~exists().where(
+                    child.user_id == ActionLog.user_id,
+                    child.prev_id == ActionLog.id,
+                    child.undone_at.isnot(None),
+                )
+            )
+            .values(before=before, after=after, created_at=func.now())
+            .returning(ActionLog.id)
+        )
+        return q.scalar_one_or_none() is not None
+
+    async def compact(self, db: AsyncSession, default_depth: int) -> int:
+        # Entries that are not undone are exactly the head and its ancestors,
+        # so the retention depth is counted along the undo chain. Per user,
+        # find the newest chain entry beyond the depth through
+        # ix_action_logs_user_id and drop it together with everything older.
+        # The head itself is always kept.
+        cutoff = (
+            select(ActionLog.id)
+            .where(ActionLog.user_id == User.id)
+            .where(ActionLog.undone_at.is_(None))
+            .order_by(ActionLog.id.desc())
+            .offset(func.coalesce(User.action_log_depth, default_depth))
+            .limit(1)
+            .scalar_subquery()
+        )
+        users = select(User.id.label("user_id"), User.undo_head_id.label("head_id"), cutoff.label("cutoff_id")).subquery()
+        trimmed = await db.execute(
+            delete(ActionLog)
+            .where(ActionLog.user_id == users.c.user_id)
+            .where(ActionLog.id <= users.c.cutoff_id)
+            .where(ActionLog.id.is_distinct_from(users.c.head_id))
+        )
+        # Undone entries older than the head belong to abandoned branches:
+        # redo only follows undone children of the head, which are newer.
+        # Served by ix_action_logs_redo.
+        abandoned = await db.execute(
+            delete(ActionLog)
+            .where(ActionLog.user_id == User.id)
+            .where(ActionLog.undone_at.isnot(None))
+            .where(ActionLog.id < User.undo_head_id)
+        )
+        return trimmed.rowcount + abandoned.rowcount
+
+    async def mark_undone(self, db: AsyncSession, action: ActionLog) -> None:
+        await db.execute(
+            update(ActionLog)
+            .where(ActionLog.id == action.id)
             .values(undone_at=func.now())
         )
-        await db.commit()
+        await self.set_head(db, action.user_id, action.prev_id)
 
-    async def mark_redone(self, db: AsyncSession, action_id: int) -> None:
+    async def mark_redone(self, db: AsyncSession, action: ActionLog) -> None:
         await db.execute(
             update(ActionLog)
-            .where(ActionLog.id == action_id)
+            .where(ActionLog.id == action.id)
             .values(undone_at=None)
         )
-        await db.commit()
+        await self.set_head(db, action.user_id, action.id)
+
+    async def set_head(self, db: AsyncSession, user_id: int, action_id: int | None) -> None:
+        await db.execute(update(User).where(User.id == user_id).values(undo_head_id=action_id))
+
+    async def stream_by_user(self, db: AsyncSession, user_id: int) -> AsyncResult:
+        table = ActionLog.__table__
+        return await db.stream(
+            select(*copy_columns(table))
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=500)
+        )
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import BigInteger, Text, case, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analysis_job import AnalysisJob
+from app.models.note import Note
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class AnalysisJobRepo:
+    async def enqueue(self, db: AsyncSession, user_id: int, note_ids: list[int], batch_id: str | None = None) -> None:
+        if not note_ids:
+            return
+        # The ids travel as one array parameter: a VALUES row per note runs
+        # into the driver's bind-parameter limit on large boards.
+        rows = select(
+            func.unnest(literal(note_ids, ARRAY(BigInteger))),
+            literal(user_id, BigInteger),
+            literal(batch_id, Text),
+        )
+        q = insert(AnalysisJob).from_select(["note_id", "user_id", "batch_id"], rows)
+        # Re-enqueueing a finished or dead-lettered note starts it over; an
+        # active job is only re-labelled with the new batch.
+        restart = AnalysisJob.status.notin_(ACTIVE_STATUSES)
+        await db.execute(
+            q.on_conflict_do_update(
+                index_elements=[AnalysisJob.note_id],
+                set_={
+                    "batch_id": func.coalesce(q.excluded.batch_id, AnalysisJob.batch_id),
+                    "status": case((restart, "pending"), else_=AnalysisJob.status),
+                    "attempts": case((restart, 0), else_=AnalysisJob.attempts),
+                    "run_after": case((restart, func.now()), else_=AnalysisJob.run_after),
+                    "last_error": case((restart, None), else_=AnalysisJob.last_error),
+                    "updated_at": func.now(),
+                },
+            )
+        )
+
+    async def claim(self, db: AsyncSession, limit: int, lease: timedelta) -> list[dict]:
+        ready = (
+            select(AnalysisJob.id)
+            .where(AnalysisJob.status.in_(ACTIVE_STATUSES))
+            .where(AnalysisJob.run_after <= func.now())
+            .order_by(AnalysisJob.run_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("ready")
+        )
+        claimed = (
+            update(AnalysisJob)
+            .where(AnalysisJob.id == ready.c.id)
+            .values(
+                status="running",
+                attempts=AnalysisJob.attempts + 1,
+                run_after=func.now() + lease,
+                updated_at=func.now(),
+            )
+            .returning(AnalysisJob.id, AnalysisJob.note_id, AnalysisJob.user_id, AnalysisJob.attempts)
+            .cte("claimed")
+        )
+        q = await db.execute(
+            select(claimed, Note.text).join(Note, Note.id == claimed.c.note_id)
+        )
+        return [dict(row) for row in q.mappings()]
+
+    async def complete(self, db: AsyncSession, job_ids: list[int]) -> None:
+        if not job_ids:
+            return
+        await db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id.in_(job_ids))
+            .values(status="done", last_error=None, updated_at=func.now())
+        )
+
+    async def fail(self, db: AsyncSession, job_id: int, error: str, retry_after: timedelta | None) -> None:
+        values = {"last_error": error, "updated_at": func.now()}
+        if retry_after is None:
+            values["status"] = "dead"
+        else:
+            values.update(status="pending", run_after=func.now() + retry_after)
+        await db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(**values))
+
+    async def batch_counts(self, db: AsyncSession, batch_id: str) -> dict[str, int]:
+        q = await db.execute(
+            select(AnalysisJob.status, func.count())
+            .where(AnalysisJob.batch_id == batch_id)
+            .group_by(AnalysisJob.status)
+        )
+        return {status: count for status, count in q.all()}
+
+    async def prune_done(self, db: AsyncSession, before: datetime) -> None:
+        await db.execute(
+            delete(AnalysisJob)
+            .where(AnalysisJob.status == "done")
+            .where(AnalysisJob.updated_at < before)
+        )
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+
+from app.models.archived_note import ArchivedNote
+from app.models.note import Note
+from app.repos.copy_repo import copy_columns
+
+ARCHIVE_PAGE_COLUMNS = (
+    ArchivedNote.id,
+    ArchivedNote.text,
+    ArchivedNote.todo_list_id,
+    ArchivedNote.severity,
+    ArchivedNote.tag,
+    ArchivedNote.device,
+    ArchivedNote.created_at,
+    ArchivedNote.updated_at,
+    ArchivedNote.archived_at,
+)
+
+
+class ArchivedNoteRepo:
+    async def archive_done(self, db: AsyncSession, cutoff: datetime, limit: int) -> list[tuple[int, int]]:
+        # Move one batch in a single statement: the DELETE fires the notes
+        # tombstone trigger, so open boards drop the rows on their next delta.
+        notes = Note.__table__
+        columns = [c.name for c in copy_columns(ArchivedNote.__table__) if c.name != "archived_at"]
+        victims = (
+            select(notes.c.id)
+            .where(notes.c.is_done)
+            .where(notes.c.updated_at < cutoff)
+            .order_by(notes.c.updated_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        moved = (
+            notes.delete()
+            .where(notes.c.id.in_(victims.scalar_subquery()))
+            .returning(*(notes.c[name] for name in columns))
+            .cte("moved")
+        )
+        q = await db.execute(
+            insert(ArchivedNote.__table__)
+            .from_select(columns, select(*(moved.c[name] for name in columns)))
+            .returning(ArchivedNote.user_id, ArchivedNote.id)
+        )
+        return [(row.user_id, row.id) for row in q]
+
+    async def exists(self, db: AsyncSession, note_id: int) -> bool:
+        q = await db.execute(select(ArchivedNote.id).where(ArchivedNote.id == note_id))
+        return q.scalar_one_or_none() is not None
+
+    async def page(self, db: AsyncSession, user_id: int, before: int | None, limit: int) -> list[dict]:
+        q = select(*ARCHIVE_PAGE_COLUMNS).where(ArchivedNote.user_id == user_id)
+        if before is not None:
+            q = q.where(ArchivedNote.id < before)
+        result = await db.execute(q.order_by(ArchivedNote.id.desc()).limit(limit))
+        return [dict(row) for row in result.mappings()]
+
+    async def stream_by_user(self, db: AsyncSession, user_id: int) -> AsyncResult:
+        table = ArchivedNote.__table__
+        return await db.stream(
+            select(*copy_columns(table))
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=500)
+        )
@@ -0,0 +1,53 @@
+from sqlalchemy import Table, column, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repos.copy_repo import row_columns
+
+# asyncpg allows 32767 bind parameters per statement.
+BIND_PARAM_BUDGET = 30000
+
+
+async def update_from_values(db: AsyncSession, table: Table, values_by_id: dict[int, dict]) -> list[tuple[dict, dict]]:
+    # One UPDATE ... FROM (VALUES ...) per distinct set of columns, joined
+    # to a locked copy of the old rows so before/after come back together.
+    groups: dict[tuple[str, ...], list[tuple]] = {}
+    for row_id, row_values in values_by_id.items():
+        if row_values:
+            keys = tuple(sorted(row_values))
+            groups.setdefault(keys, []).append((row_id, *(row_values[k] for k in keys)))
+
+    columns = row_columns(table)
+    changed: list[tuple[dict, dict]] = []
+    for keys, group in groups.items():
+        # Each row binds its id and values, plus the id again in the lock.
+        chunk = BIND_PARAM_BUDGET // (len(keys) + 2)
+        for i in range(0, len(group), chunk):
+            changed.extend(await _update_chunk(db, table, columns, keys, group[i:i + chunk]))
+    changed.sort(key=lambda pair: pair[1]["id"])
+    return changed
+
+
+async def _update_chunk(db: AsyncSession, table: Table, columns: list, keys: tuple[str, ...], rows: list[tuple]) -> list[tuple[dict, dict]]:
+    new = values(
+            column("id", table.c.id.type),
+        *(column(k, table.c[k].type) for k in keys),
+        name="new",
+    ).data(rows)
+    ids = [row[0] for row in rows]
+    old = select(*columns).where(table.c.id.in_(ids)).with_for_update(key_share=True).cte("old")
+    q = await db.execute(
+        update(table)
+        .where(table.c.id == new.c.id)
+        .where(table.c.id == old.c.id)
+        .values({k: new.c[k] for k in keys})
+        .returning(
+            *(old.c[c.name].label(f"old_{c.name}") for c in columns),
+            *columns,
+        )
+    )
+    changed: list[tuple[dict, dict]] = []
+    for row in q.mappings():
+        before = {c.name: row[f"old_{c.name}"] for c in columns}
+        after = {c.name: row[c.name] for c in columns}
+        changed.append((before, after))
+    return changed
@@ -0,0 +1,18 @@
+from sqlalchemy import Select, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def column_arrays(
+    db: AsyncSession, q: Select, order_by: str, descending: bool = False
+) -> tuple[dict[str, list], int]:
+    # One row back: an array per selected column, all in the same order.
+    rows = q.subquery("rows")
+    key = rows.c[order_by].desc() if descending else rows.c[order_by]
+    shown = [c for c in rows.c if c.name != order_by]
+    result = await db.execute(
+        select(*(func.array_agg(aggregate_order_by(c, key)).label(c.name) for c in shown), func.count().label("count"))
+        .select_from(rows)
+    )
+    row = result.mappings().one()
+    return {c.name: row[c.name] or [] for c in shown}, row["count"]
@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, Table, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+RESERVE_IDS_SQL = text(
+    "SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"
+)
+
+
+def copy_columns(table: Table) -> list:
+    return [c for c in table.c if c.computed is None]
+
+
+def row_columns(table: Table) -> list:
+    # Search vectors only matter to the index; keep them out of row payloads.
+    return [c for c in table.c if not isinstance(c.type, TSVECTOR)]
+
+
+class CopyRepo:
+    async def reserve_ids(self, db: AsyncSession, table: Table, n: int) -> list[int]:
+        if n <= 0:
+            return []
+        q = await db.execute(RESERVE_IDS_SQL, {"table": table.name, "n": n})
+        return list(q.scalars().all())
+
+    async def copy_rows(self, db: AsyncSession, table: Table, rows: list[dict]) -> None:
+        if not rows:
+            return
+        columns = copy_columns(table)
+        records = []
+        for row in rows:
+            record = []
+            for c in columns:
+                v = row.get(c.name)
+                if v is not None and isinstance(c.type, JSONB):
+                    v = json.dumps(v)
+                elif isinstance(v, str) and isinstance(c.type, DateTime):
+                    v = datetime.fromisoformat(v)
+                record.append(v)
+            records.append(tuple(record))
+        connection = await db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            table.name,
+            records=records,
+            columns=[c.name for c in columns],
+        )
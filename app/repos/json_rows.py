@@ -0,0 +1,22 @@
+from sqlalchemy import Select, Text, func, literal, literal_column, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def json_rows(
+    db: AsyncSession, q: Select, order_by: str, descending: bool = False, hidden: tuple[str, ...] = ()
+) -> tuple[str, int]:
+    # Postgres renders the rows as one compact JSON array of objects keyed by
+    # the column labels in select order, so no ORM objects are built per row.
+    rows = q.subquery("rows")
+    shown = select(*(c for c in rows.c if c.name not in hidden)).correlate(rows).lateral("row")
+    key = rows.c[order_by].desc() if descending else rows.c[order_by]
+    item = func.row_to_json(shown.table_valued()).cast(Text)
+    result = await db.execute(
+        select(
+            literal("[", Text) + func.coalesce(func.string_agg(item, aggregate_order_by(literal_column("','"), key)), "") + "]",
+            func.count(),
+        ).select_from(rows.join(shown, true()))
+    )
+    body, count = result.one()
+    return body, count
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.llm_cache import LlmCacheEntry
+
+
+class LlmCacheRepo:
+    async def get_many(self, db: AsyncSession, keys: list[str]) -> dict[str, dict]:
+        if not keys:
+            return {}
+        q = await db.execute(
+            select(LlmCacheEntry.key, LlmCacheEntry.result)
+            .where(LlmCacheEntry.key.in_(keys))
+            .where(LlmCacheEntry.expires_at > func.now())
+        )
+        return {key: result for key, result in q.all()}
+
+    async def put_many(self, db: AsyncSession, results: dict[str, dict], ttl: timedelta) -> None:
+        if not results:
+            return
+        q = insert(LlmCacheEntry).values(
+            [{"key": key, "result": result, "expires_at": func.now() + ttl} for key, result in results.items()]
+        )
+        await db.execute(
+            q.on_conflict_do_update(
+                index_elements=[LlmCacheEntry.key],
+                set_={"result": q.excluded.result, "expires_at": q.excluded.expires_at},
+            )
+        )
+
+    async def prune(self, db: AsyncSession) -> None:
+        await db.execute(delete(LlmCacheEntry).where(LlmCacheEntry.expires_at <= func.now()))
@@ -1,20 +1,115 @@
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+import os
 
-from app.models.note import Note
+from sqlalchemy import BigInteger, Integer, Text, case, cast, delete, func, insert, literal, literal_column, or_, select, text, union_all, update
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+
+from app.models.note import BOARD_TILE_SIZE, SEARCH_CONFIGS, Note, SeverityEnum
+from app.repos.bulk_update import update_from_values
+from app.repos.column_arrays import column_arrays
+from app.repos.copy_repo import copy_columns, row_columns
+from app.repos.json_rows import json_rows
+
+BOARD_NOTE_LIMIT = 2000
+BBOX_NOTE_LIMIT = 5000
+# Notes are anchored at their top-left corner; a card reaching into the
+# viewport can start up to this far to the left of / above it.
+NOTE_EXTENT_X = 260
+NOTE_EXTENT_Y = 400
+# Board payloads carry at most this many characters of each note's text;
+# the full body is fetched by id.
+BOARD_TEXT_PREVIEW_CHARS = int(os.getenv("BOARD_TEXT_PREVIEW_CHARS", "280"))
+
+# Spelled exactly like ix_notes_notify_at so the planner can use the index.
+NOTIFY_AT = literal_column("notes.notify_value ->> 'at'", Text)
+PENDING_REMINDER = text("notes.notify_by = 'time' AND NOT notes.is_done")
+PENDING_GEOFENCE = text("notes.notify_by = 'location' AND NOT notes.is_done")
+GEOFENCE_INSIDE = "inside"
+
+SEARCH_HIGHLIGHT_START = "\x02"
+SEARCH_HIGHLIGHT_STOP = "\x03"
+SEARCH_HEADLINE_OPTIONS = (
+    f"StartSel={SEARCH_HIGHLIGHT_START}, StopSel={SEARCH_HIGHLIGHT_STOP}, "
+    "MaxFragments=2, MaxWords=24, MinWords=8, FragmentDelimiter=\" … \""
+)
+
+BOARD_TEXT_PREVIEW = func.left(Note.text, BOARD_TEXT_PREVIEW_CHARS).label("text")
+# First 32 bits of md5(text): clients key cached full bodies on it, so moving
+# a note does not invalidate its text.
+NOTE_TEXT_HASH = cast(cast(func.concat("x", func.left(func.md5(Note.text), 8)), BIT(32)), BigInteger).label("text_hash")
+NOTE_TEXT_LEN = func.char_length(Note.text).label("text_len")
+
+BOARD_NOTIFY_TIME = case(
+    (Note.notify_by == "time", func.nullif(Note.notify_value["at"].astext, "")), else_=None
+).label("notify_time")
+
+# Field order is the board payload's.
+BOARD_NOTE_COLUMNS = (
+    Note.id,
+    BOARD_TEXT_PREVIEW,
+    NOTE_TEXT_LEN,
+    NOTE_TEXT_HASH,
+    Note.pos_x,
+    Note.pos_y,
+    Note.todo_list_id,
+    Note.severity,
+    Note.tag,
+    Note.is_processed_by_llm,
+    Note.device,
+    BOARD_NOTIFY_TIME,
+    Note.is_done,
+    Note.created_at,
+)
+
+# Same fields, shaped for the columnar board format: enum codes and packed
+# flags.
+BOARD_NOTE_ARRAYS = (
+    Note.id,
+    Note.pos_x,
+    Note.pos_y,
+    Note.todo_list_id,
+    (func.array_position(func.enum_range(cast(None, SeverityEnum)), Note.severity) - 1).label("severity"),
+    (cast(Note.is_done, Integer) + cast(Note.is_processed_by_llm, Integer) * 2).label("flags"),
+    Note.tag,
+    Note.device,
+    BOARD_NOTIFY_TIME,
+    NOTE_TEXT_LEN,
+    NOTE_TEXT_HASH,
+    BOARD_TEXT_PREVIEW,
+    Note.created_at,
+)
+
+NULLABLE_PATCH_FIELDS = {"todo_list_id", "tag", "notify_by", "notify_value", "device", "geo", "meta"}
 
 
 class NoteRepo:
+    @staticmethod
+    def _patch_values(fields: dict) -> dict:
+        return {
+            k: v
+            for k, v in fields.items()
+            if k in NULLABLE_PATCH_FIELDS or v is not None
+        }
+
     async def get(self, db: AsyncSession, note_id: int) -> Note | None:
         q = await db.execute(select(Note).where(Note.id == note_id))
         return q.scalar_one_or_none()
 
     async def create(self, db: AsyncSession, note: Note) -> Note:
         db.add(note)
-        await db.commit()
-        await db.refresh(note)
+        await db.flush()
         return note
 
+    async def create_many(self, db: AsyncSession, rows: list[dict]) -> list[dict]:
+        if not rows:
+            return []
+        table = Note.__table__
+        q = await db.execute(
+            insert(table).returning(*row_columns(table), sort_by_parameter_order=True),
+            rows,
+        )
+        return [dict(r) for r in q.mappings().all()]
+
     async def create_from_snapshot(self, db: AsyncSession, data: dict) -> Note:
         note = Note(
             id=data.get("id"),
@@ -30,36 +125,266 @@ class NoteRepo:
             notify_value=data.get("notify_value"),
             severity=data.get("severity") or "normal",
             tag=data.get("tag"),
+            is_done=bool(data.get("is_done", False)),
             meta=data.get("meta") or {},
         )
         db.add(note)
-        await db.commit()
-        await db.refresh(note)
+        await db.flush()
         return note
 
     async def list_by_user(self, db: AsyncSession, user_id: int) -> list[Note]:
         q = await db.execute(
             select(Note)
             .where(Note.user_id == user_id)
-            .order_by(Note.created_at.desc())
-            .limit(2000)
+            .order_by(Note.is_done, Note.created_at.desc())
+            .limit(BOARD_NOTE_LIMIT)
         )
         return list(q.scalars().all())
 
-    async def patch(self, db: AsyncSession, note_id: int, **fields) -> None:
-        q = await db.execute(select(Note).where(Note.id == note_id))
-        obj = q.scalar_one()
-        for k, v in fields.items():
-            if k in {"todo_list_id", "tag", "notify_by", "notify_value", "device", "geo", "meta"}:
-                setattr(obj, k, v)
-            elif v is not None:
-                setattr(obj, k, v)
-        await db.commit()
-
-    async def delete(self, db: AsyncSession, note_id: int) -> None:
-        q = await db.execute(select(Note).where(Note.id == note_id))
-        obj = q.scalar_one_or_none()
-        if not obj:
-            return
-        await db.delete(obj)
-        await db.commit()
+    def _board_query(self, columns, user_id: int, since, bbox: tuple[float, float, float, float] | None):
+        q = select(*columns).where(Note.user_id == user_id)
+        limit = BOARD_NOTE_LIMIT
+        if since is not None:
+            q = q.where(Note.updated_at >= since)
+            limit = None
+        if bbox is not None:
+            x0, y0, x1, y1 = bbox
+            x0 -= NOTE_EXTENT_X
+            y0 -= NOTE_EXTENT_Y
+            q = (
+                q.where(Note.tile_x.between(int(x0 // BOARD_TILE_SIZE), int(x1 // BOARD_TILE_SIZE)))
+                .where(Note.tile_y.between(int(y0 // BOARD_TILE_SIZE), int(y1 // BOARD_TILE_SIZE)))
+                .where(Note.pos_x.between(x0, x1))
+                .where(Note.pos_y.between(y0, y1))
+            )
+            limit = BBOX_NOTE_LIMIT
+        if limit is None:
+            return q.order_by(Note.created_at.desc())
+        # Active notes fill the cap first and done ones only take what is
+        # left; the active branch is served by the partial index.
+        active = q.where(~Note.is_done).order_by(Note.created_at.desc()).limit(limit)
+        done = q.where(Note.is_done).order_by(Note.created_at.desc()).limit(limit)
+        rows = union_all(
+            active.add_columns(literal(0).label("done_rank")),
+            done.add_columns(literal(1).label("done_rank")),
+        ).subquery()
+        return (
+            select(*(c for c in rows.c if c.name != "done_rank"))
+            .order_by(rows.c.done_rank, rows.c.created_at.desc())
+            .limit(limit)
+        )
+
+    async def board_json(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        since=None,
+        bbox: tuple[float, float, float, float] | None = None,
+    ) -> tuple[str, int]:
+        q = self._board_query(BOARD_NOTE_COLUMNS, user_id, since, bbox)
+        return await json_rows(db, q, "created_at", descending=True, hidden=("created_at",))
+
+    async def board_columns(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        since=None,
+        bbox: tuple[float, float, float, float] | None = None,
+    ) -> tuple[dict[str, list], int]:
+        q = self._board_query(BOARD_NOTE_ARRAYS, user_id, since, bbox)
+        return await column_arrays(db, q, "created_at", descending=True)
+
+    async def bodies(self, db: AsyncSession, note_ids: list[int]) -> list[dict]:
+        q = await db.execute(
+            select(Note.id, Note.text, NOTE_TEXT_HASH, Note.updated_at).where(Note.id.in_(note_ids)).order_by(Note.id)
+        )
+        return [dict(row) for row in q.mappings()]
+
+    async def lock_many(self, db: AsyncSession, note_ids: list[int], *columns) -> dict[int, dict]:
+        # Same lock strength as patch(), so the rows can't change before the
+        # caller's UPDATE in this transaction.
+        q = await db.execute(
+            select(Note.id, *columns).where(Note.id.in_(note_ids)).with_for_update(key_share=True)
+        )
+        return {row["id"]: dict(row) for row in q.mappings()}
+
+    async def patch(self, db: AsyncSession, note_id: int, **fields) -> tuple[dict, dict] | None:
+        table = Note.__table__
+        columns = row_columns(table)
+        values = self._patch_values(fields)
+        if not values:
+            q = await db.execute(select(*columns).where(table.c.id == note_id))
+            row = q.mappings().one_or_none()
+            return (dict(row), dict(row)) if row else None
+        old = select(*columns).where(table.c.id == note_id).with_for_update(key_share=True).cte("old")
+        q = await db.execute(
+            update(table)
+            .where(table.c.id == old.c.id)
+            .values(**values)
+            .returning(
+                *(old.c[c.name].label(f"old_{c.name}") for c in columns),
+                *columns,
+            )
+        )
+        row = q.mappings().one_or_none()
+        if not row:
+            return None
+        before = {c.name: row[f"old_{c.name}"] for c in columns}
+        after = {c.name: row[c.name] for c in columns}
+        return before, after
+
+    async def patch_many(self, db: AsyncSession, patches: dict[int, dict]) -> list[tuple[dict, dict]]:
+        values_by_id = {note_id: self._patch_values(fields) for note_id, fields in patches.items()}
+        return await update_from_values(db, Note.__table__, values_by_id)
+
+    async def list_unprocessed_ids(self, db: AsyncSession, user_id: int) -> list[int]:
+        q = await db.execute(
+            select(Note.id)
+            .where(Note.user_id == user_id)
+            .where(Note.is_processed_by_llm.is_(False))
+            .order_by(Note.id)
+        )
+        return list(q.scalars().all())
+
+    async def has_trigram_index(self, db: AsyncSession) -> bool:
+        q = await db.execute(select(func.to_regclass("ix_notes_text_trgm").isnot(None)))
+        return bool(q.scalar())
+
+    async def search(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        limit: int,
+        offset: int,
+        fuzzy: bool,
+    ) -> list[dict]:
+        tsquery = None
+        for config in SEARCH_CONFIGS:
+            part = func.websearch_to_tsquery(literal_column(f"'{config}'::regconfig"), query)
+            tsquery = part if tsquery is None else tsquery.op("||")(part)
+        matched = Note.search_vector.op("@@")(tsquery)
+        rank = func.ts_rank_cd(Note.search_vector, tsquery)
+        if fuzzy:
+            matched = or_(matched, literal(query).op("<%")(Note.text))
+            rank = rank + func.word_similarity(query, Note.text)
+        hits = (
+            select(Note.id, rank.label("rank"))
+            .where(Note.user_id == user_id)
+            .where(matched)
+            .order_by(rank.desc(), Note.id.desc())
+            .limit(limit)
+            .offset(offset)
+            .subquery()
+        )
+        # Headlines are expensive, so only the page being returned gets one.
+        headline = func.ts_headline(
+            literal_column(f"'{SEARCH_CONFIGS[0]}'::regconfig"),
+            Note.text,
+            tsquery,
+            SEARCH_HEADLINE_OPTIONS,
+        )
+        q = await db.execute(
+            select(
+                Note.id,
+                Note.todo_list_id,
+                Note.is_done,
+                Note.pos_x,
+                Note.pos_y,
+                hits.c.rank,
+                headline.label("headline"),
+            )
+            .join(hits, hits.c.id == Note.id)
+            .order_by(hits.c.rank.desc(), Note.id.desc())
+        )
+        return [dict(row) for row in q.mappings()]
+
+    @staticmethod
+    def _pending_reminders():
+        return (
+            select(Note.id, Note.user_id, NOTIFY_AT.label("at"))
+            .where(PENDING_REMINDER)
+            .where(NOTIFY_AT.isnot(None))
+            .where(Note.notified_for.is_distinct_from(NOTIFY_AT))
+        )
+
+    async def list_pending_reminders(self, db: AsyncSession, after: str, before: str, limit: int) -> list[dict]:
+        q = await db.execute(
+            self._pending_reminders()
+            .where(NOTIFY_AT >= after)
+            .where(NOTIFY_AT < before)
+            .order_by(NOTIFY_AT)
+            .limit(limit)
+        )
+        return [dict(row) for row in q.mappings()]
+
+    async def get_pending_reminders(self, db: AsyncSession, note_ids: list[int]) -> list[dict]:
+        q = await db.execute(self._pending_reminders().where(Note.id.in_(note_ids)))
+        return [dict(row) for row in q.mappings()]
+
+    async def claim_reminders(self, db: AsyncSession, note_ids: list[int], now: str) -> list[dict]:
+        q = await db.execute(
+            update(Note)
+            .where(Note.id.in_(note_ids))
+            .where(PENDING_REMINDER)
+            .where(NOTIFY_AT <= now)
+            .where(Note.notified_for.is_distinct_from(NOTIFY_AT))
+            .values(notified_for=NOTIFY_AT)
+            .returning(Note.id, Note.user_id, Note.text, NOTIFY_AT.label("at"))
+        )
+        return [dict(row) for row in q.mappings()]
+
+    async def list_geofences(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        cells_y: tuple[int, int],
+        cells_x: tuple[int, int],
+    ) -> list[dict]:
+        q = await db.execute(
+            select(Note.id, Note.text, Note.geo, Note.notify_value, Note.notified_for)
+            .where(Note.user_id == user_id)
+            .where(PENDING_GEOFENCE)
+            .where(Note.geo_cell_y.between(*cells_y))
+            .where(Note.geo_cell_x.between(*cells_x))
+        )
+        return [dict(row) for row in q.mappings()]
+
+    async def enter_geofences(self, db: AsyncSession, user_id: int, note_ids: list[int]) -> list[int]:
+        if not note_ids:
+            return []
+        q = await db.execute(
+            update(Note)
+            .where(Note.user_id == user_id)
+            .where(Note.id.in_(note_ids))
+            .where(PENDING_GEOFENCE)
+            .where(Note.notified_for.is_distinct_from(GEOFENCE_INSIDE))
+            .values(notified_for=GEOFENCE_INSIDE)
+            .returning(Note.id)
+        )
+        return list(q.scalars().all())
+
+    async def leave_geofences(self, db: AsyncSession, user_id: int, keep_ids: list[int]) -> None:
+        await db.execute(
+            update(Note)
+            .where(Note.user_id == user_id)
+            .where(PENDING_GEOFENCE)
+            .where(Note.notified_for == GEOFENCE_INSIDE)
+            .where(Note.id.notin_(keep_ids))
+            .values(notified_for=None)
+        )
+
+    async def delete(self, db: AsyncSession, note_id: int) -> dict | None:
+        table = Note.__table__
+        q = await db.execute(delete(table).where(table.c.id == note_id).returning(*row_columns(table)))
+        row = q.mappings().one_or_none()
+        return dict(row) if row else None
+
+    async def stream_by_user(self, db: AsyncSession, user_id: int) -> AsyncResult:
+        table = Note.__table__
+        return await db.stream(
+            select(*copy_columns(table))
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=500)
+        )
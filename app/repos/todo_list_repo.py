@@ -1,7 +1,10 @@
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
 from app.models.todo_list import TodoList
+from app.repos.bulk_update import update_from_values
+from app.repos.copy_repo import copy_columns
+from app.repos.json_rows import json_rows
 
 
 class TodoListRepo:
@@ -10,13 +13,55 @@ class TodoListRepo:
         return q.scalar_one_or_none()
 
     async def list_by_user(self, db: AsyncSession, user_id: int) -> list[TodoList]:
-        q = await db.execute(select(TodoList).where(TodoList.user_id == user_id))
+        q = await db.execute(
+            select(TodoList).where(TodoList.user_id == user_id).order_by(TodoList.id)
+        )
         return list(q.scalars().all())
 
-    async def create_defaults_if_empty(self, db: AsyncSession, user_id: int) -> None:
-        existing = await self.list_by_user(db, user_id)
-        if existing:
-            return
+    async def board_json(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        since=None,
+        bbox: tuple[float, float, float, float] | None = None,
+    ) -> tuple[str, int]:
+        q = select(
+            TodoList.id, TodoList.title, TodoList.pos_x, TodoList.pos_y, TodoList.width, TodoList.height
+        ).where(TodoList.user_id == user_id)
+        if since is not None:
+            q = q.where(TodoList.updated_at >= since)
+        if bbox is not None:
+            x0, y0, x1, y1 = bbox
+            q = (
+                q.where(TodoList.pos_x <= x1)
+                .where(TodoList.pos_x + TodoList.width >= x0)
+                .where(TodoList.pos_y <= y1)
+                .where(TodoList.pos_y + TodoList.height >= y0)
+            )
+        return await json_rows(db, q, "id")
+
+    async def ids_by_users(self, db: AsyncSession, user_ids: list[int]) -> dict[int, set[int]]:
+        q = await db.execute(
+            select(TodoList.id, TodoList.user_id).where(TodoList.user_id.in_(user_ids))
+        )
+        result: dict[int, set[int]] = {uid: set() for uid in user_ids}
+        for list_id, user_id in q.all():
+            result[user_id].add(list_id)
+        return result
+
+    async def titles_by_users(self, db: AsyncSession, user_ids: list[int]) -> dict[int, list[str]]:
+        q = await db.execute(
+            select(TodoList.user_id, TodoList.title).where(TodoList.user_id.in_(user_ids))
+        )
+        result: dict[int, list[str]] = {uid: [] for uid in user_ids}
+        for user_id, title in q.all():
+            result[user_id].append(title)
+        return result
+
+    async def create_defaults_if_empty(self, db: AsyncSession, user_id: int) -> bool:
+        q = await db.execute(select(TodoList.id).where(TodoList.user_id == user_id).limit(1))
+        if q.first() is not None:
+            return False
         titles = ["Рутуб", "Автопродажник", "Покупки"]
         frames = [
             TodoList(user_id=user_id, title=titles[0], pos_x=200, pos_y=120),
@@ -24,15 +69,39 @@ class TodoListRepo:
             TodoList(user_id=user_id, title=titles[2], pos_x=200, pos_y=560),
         ]
         db.add_all(frames)
-        await db.commit()
+        await db.flush()
+        return True
 
-    async def patch(self, db: AsyncSession, list_id: int, **fields) -> None:
-        q = await db.execute(select(TodoList).where(TodoList.id == list_id))
-        obj = q.scalar_one()
-        for k, v in fields.items():
-            if v is not None:
-                setattr(obj, k, v)
-        await db.commit()
+    async def patch_many(self, db: AsyncSession, patches: dict[int, dict]) -> list[tuple[dict, dict]]:
+        values_by_id = {
+            list_id: {k: v for k, v in fields.items() if v is not None}
+            for list_id, fields in patches.items()
+        }
+        return await update_from_values(db, TodoList.__table__, values_by_id)
+
+    async def patch(self, db: AsyncSession, list_id: int, **fields) -> tuple[dict, dict] | None:
+        table = TodoList.__table__
+        values = {k: v for k, v in fields.items() if v is not None}
+        if not values:
+            q = await db.execute(select(table).where(table.c.id == list_id))
+            row = q.mappings().one_or_none()
+            return (dict(row), dict(row)) if row else None
+        old = select(table).where(table.c.id == list_id).with_for_update(key_share=True).cte("old")
+        q = await db.execute(
+            update(table)
+            .where(table.c.id == old.c.id)
+            .values(**values)
+            .returning(
+                *(old.c[c.name].label(f"old_{c.name}") for c in table.c),
+                *table.c,
+            )
+        )
+        row = q.mappings().one_or_none()
+        if not row:
+            return None
+        before = {c.name: row[f"old_{c.name}"] for c in table.c}
+        after = {c.name: row[c.name] for c in table.c}
+        return before, after
 
     async def create_from_snapshot(self, db: AsyncSession, data: dict) -> TodoList:
         todo_list = TodoList(
@@ -45,6 +114,14 @@ class TodoListRepo:
             height=data.get("height", 360),
         )
         db.add(todo_list)
-        await db.commit()
-        await db.refresh(todo_list)
+        await db.flush()
         return todo_list
+
+    async def stream_by_user(self, db: AsyncSession, user_id: int) -> AsyncResult:
+        table = TodoList.__table__
+        return await db.stream(
+            select(*copy_columns(table))
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=500)
+        )
@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.tombstone import Tombstone
+
+# A transaction open longer than this no longer holds every client's cursor
+# back; its writes may then be missed by deltas until the next full board.
+SYNC_CURSOR_MAX_LAG_SECONDS = float(os.getenv("SYNC_CURSOR_MAX_LAG_SECONDS", "60"))
+
+# The cursor may not run ahead of any transaction that is still open: rows
+# written by it carry its start time in updated_at and only become visible
+# once it commits. Only client sessions count (autovacuum and other
+# background workers never write our rows); other roles' sessions show a
+# NULL xact_start unless this role has pg_read_all_stats.
+SYNC_CURSOR_SQL = """
+SELECT greatest(
+    least(
+        now(),
+        coalesce(
+            (
+                SELECT min(xact_start) FROM pg_stat_activity
+                WHERE datname = current_database()
+                  AND pid <> pg_backend_pid()
+                  AND backend_type = 'client backend'
+                  AND state <> 'idle'
+                  AND xact_start IS NOT NULL
+            ),
+            now()
+        )
+    ),
+    now() - make_interval(secs => :max_lag)
+)
+"""
+
+
+class TombstoneRepo:
+    async def sync_cursor(self, db: AsyncSession) -> datetime:
+        q = await db.execute(text(SYNC_CURSOR_SQL), {"max_lag": SYNC_CURSOR_MAX_LAG_SECONDS})
+        return q.scalar_one()
+
+    async def list_since(self, db: AsyncSession, user_id: int, since: datetime) -> dict[str, list[int]]:
+        q = await db.execute(
+            select(Tombstone.entity_type, Tombstone.entity_id)
+            .where(Tombstone.user_id == user_id)
+            .where(Tombstone.deleted_at >= since)
+        )
+        result: dict[str, list[int]] = {"note": [], "todo_list": []}
+        for entity_type, entity_id in q.all():
+            result.setdefault(entity_type, []).append(entity_id)
+        return result
+
+    async def prune(self, db: AsyncSession, before: datetime) -> None:
+        await db.execute(delete(Tombstone).where(Tombstone.deleted_at < before))
@@ -1,21 +1,32 @@
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
 
 
 class UserRepo:
-    async def get_by_key(self, db: AsyncSession, user_key: str) -> User | None:
-        q = await db.execute(select(User).where(User.user_key == user_key))
+    async def get_by_key(self, db: AsyncSession, user_key: str, for_update: bool = False) -> User | None:
+        q = select(User).where(User.user_key == user_key)
+        if for_update:
+            q = q.with_for_update(key_share=True)
+        q = await db.execute(q)
         return q.scalar_one_or_none()
 
-    async def get_or_create(self, db: AsyncSession, user_key: str) -> User:
-        q = await db.execute(select(User).where(User.user_key == user_key))
-        user = q.scalar_one_or_none()
-        if user:
-            return user
-        user = User(user_key=user_key)
-        db.add(user)
-        await db.commit()
-        await db.refresh(user)
-        return user
+    async def get_or_create_id(self, db: AsyncSession, user_key: str) -> tuple[int, bool]:
+        lookup = select(User.id).where(User.user_key == user_key)
+        user_id = (await db.execute(lookup)).scalar_one_or_none()
+        if user_id is not None:
+            return user_id, False
+        # A concurrent first request for the same key waits on our insert and
+        # then falls through to the lookup instead of failing the constraint.
+        q = await db.execute(
+            insert(User)
+            .values(user_key=user_key)
+            .on_conflict_do_nothing(index_elements=[User.user_key])
+            .returning(User.id)
+        )
+        user_id = q.scalar_one_or_none()
+        if user_id is not None:
+            return user_id, True
+        return (await db.execute(lookup)).scalar_one(), False
@@ -1,53 +1,143 @@
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+import asyncio
+import json
+import math
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_session
-from app.schemas.todo_list import TodoListPatchIn
-from app.services.board_service import BoardService
+from app.db import SessionLocal, get_session
+from app.models.note import BOARD_COORD_LIMIT, BOARD_TILE_SIZE
+from app.schemas.todo_list import TodoListPatchIn, TodoListsBatchPatchIn
+from app.services.board_cache import board_cache
+from app.services.board_columnar import COLUMNAR_MEDIA_TYPE, encode_board
+from app.services.board_events import board_events
+from app.services.board_service import BoardService, BoardState
+from app.services.export_service import ExportService, InvalidImport
+from app.services.geometry_buffer import flush_geometry, geometry_buffer
 
 router = APIRouter()
 svc = BoardService()
+exports = ExportService()
 templates = Jinja2Templates(directory="templates")
 
-@router.get("/api/board/{user}")
-async def board_json(user: str, db: AsyncSession = Depends(get_session)):
-    _, lists, notes = await svc.get_board(db, user)
+def parse_bbox(raw: str | None) -> tuple[float, float, float, float] | None:
+    if raw is None:
+        return None
+    try:
+        x0, y0, x1, y1 = (float(v) for v in raw.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be x0,y0,x1,y1")
+    if not all(math.isfinite(v) for v in (x0, y0, x1, y1)):
+        raise HTTPException(status_code=400, detail="bbox values must be finite numbers")
+    if x1 < x0 or y1 < y0:
+        raise HTTPException(status_code=400, detail="bbox must be x0,y0,x1,y1 with x0<=x1, y0<=y1")
+    # No note lies outside the coordinate limit, so a larger viewport is
+    # clamped instead of overflowing the tile range.
+    x0, y0, x1, y1 = (min(max(v, -BOARD_COORD_LIMIT), BOARD_COORD_LIMIT) for v in (x0, y0, x1, y1))
+    return x0, y0, x1, y1
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return any(tag.strip().removeprefix("W/") in (etag, "*") for tag in header.split(","))
+
+def board_response(request: Request, body: bytes, etag: str, media_type: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def board_head(user: str, state: BoardState) -> dict:
     return {
         "user": user,
-        "lists": [
-            {
-                "id": x.id,
-                "title": x.title,
-                "pos_x": x.pos_x,
-                "pos_y": x.pos_y,
-                "width": x.width,
-                "height": x.height,
-            }
-            for x in lists
-        ],
-        "notes": [
-            {
-                "id": n.id,
-                "text": n.text,
-                "pos_x": n.pos_x,
-                "pos_y": n.pos_y,
-                "todo_list_id": n.todo_list_id,
-                "severity": n.severity,
-                "tag": n.tag,
-                "is_processed_by_llm": n.is_processed_by_llm,
-                "device": n.device,
-                "notify_time": (
-                    n.notify_value.get("at") if isinstance(n.notify_value, dict) and n.notify_by == "time" and n.notify_value.get("at")
-                    else None
-                ),
-                "is_done": n.is_done,
-            }
-            for n in notes
-        ],
+        "cursor": state.cursor.isoformat(),
+        "full": state.full,
+        "complete": state.complete,
+        "tile_size": BOARD_TILE_SIZE,
     }
 
+def board_deleted(state: BoardState) -> dict | None:
+    if state.deleted is None:
+        return None
+    return {"notes": state.deleted.get("note", []), "lists": state.deleted.get("todo_list", [])}
+
+def board_body(user: str, state: BoardState) -> bytes:
+    # The lists and notes arrays arrive as JSON text from Postgres and are
+    # spliced in as-is; only the small envelope is serialized here.
+    head = board_head(user, state)
+    parts = [
+        json.dumps(head, ensure_ascii=False, separators=(",", ":"))[:-1],
+        ',"lists":',
+        state.lists_json,
+        ',"notes":',
+        state.notes_json,
+    ]
+    deleted = board_deleted(state)
+    if deleted is not None:
+        parts += [',"deleted":', json.dumps(deleted, separators=(",", ":"))]
+    parts.append("}")
+    return "".join(parts).encode()
+
+def board_columnar_body(user: str, state: BoardState) -> bytes:
+    return encode_board(
+        board_head(user, state), state.lists_json, board_deleted(state), state.note_columns, state.note_count
+    )
+
+@router.get("/api/board/{user}", dependencies=[Depends(flush_geometry)])
+async def board_json(
+    user: str,
+    request: Request,
+    since: datetime | None = None,
+    bbox: str | None = None,
+    format: Literal["json", "columnar"] | None = None,
+    db: AsyncSession = Depends(get_session),
+):
+    if format is None:
+        format = "columnar" if COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "") else "json"
+    media_type = COLUMNAR_MEDIA_TYPE if format == "columnar" else "application/json"
+    # Only the plain full board is cached; deltas and viewport slices are
+    # cheap on their own and vary per client.
+    cacheable = since is None and bbox is None
+    if cacheable:
+        cached = board_cache.get(user, format)
+        if cached is not None:
+            return board_response(request, cached.body, cached.etag, media_type)
+        version = board_cache.version()
+
+    state = await svc.get_board(db, user, since=since, bbox=parse_bbox(bbox), columnar=format == "columnar")
+    body = board_columnar_body(user, state) if format == "columnar" else board_body(user, state)
+    if cacheable:
+        entry = board_cache.put(user, state.user_id, body, version, format)
+        return board_response(request, entry.body, entry.etag, media_type)
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+@router.get("/api/board/{user}/events")
+async def board_event_stream(user: str, request: Request):
+    async with SessionLocal() as db:
+        user_id = await svc.resolve_user_id(db, user)
+
+    async def stream():
+        async with board_events.subscribe(user_id) as queue:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/board/{user}", response_class=HTMLResponse, name="board_page")
 async def board_page(user: str, request: Request):
     response = templates.TemplateResponse("board.html", {"request": request, "user": user})
@@ -74,21 +164,62 @@ async def list_page(user: str, request: Request):
     )
     return response
 
+@router.patch("/api/todo_lists:batch")
+async def patch_todo_lists(payload: TodoListsBatchPatchIn, db: AsyncSession = Depends(get_session)):
+    items = {item.id: item.model_dump(exclude_unset=True, exclude={"id"}) for item in payload.items}
+    if all(geometry_buffer.accepts("todo_list", fields) for fields in items.values()):
+        geometry_buffer.put("todo_list", items)
+        return {"ok": True, "updated": len(items), "buffered": True}
+    await flush_geometry()
+    updated = await svc.patch_todo_lists(db, items)
+    return {"ok": True, "updated": updated}
+
 @router.patch("/api/todo_lists/{list_id}")
 async def patch_todo_list(list_id: int, payload: TodoListPatchIn, db: AsyncSession = Depends(get_session)):
-    await svc.patch_todo_list(db, list_id, **payload.model_dump())
+    fields = payload.model_dump(exclude_unset=True)
+    if geometry_buffer.accepts("todo_list", fields):
+        geometry_buffer.put("todo_list", {list_id: fields})
+        return {"ok": True, "buffered": True}
+    await flush_geometry()
+    await svc.patch_todo_list(db, list_id, **fields)
     return {"ok": True}
 
-@router.post("/api/users/{user}/undo")
+@router.post("/api/users/{user}/undo", dependencies=[Depends(flush_geometry)])
 async def undo_last_action(user: str, db: AsyncSession = Depends(get_session)):
     ok = await svc.undo_last_action(db, user)
     return {"ok": ok}
 
-@router.post("/api/users/{user}/redo")
+@router.post("/api/users/{user}/redo", dependencies=[Depends(flush_geometry)])
 async def redo_last_action(user: str, db: AsyncSession = Depends(get_session)):
     ok = await svc.redo_last_action(db, user)
     return {"ok": ok}
 
+@router.get("/api/users/{user}/export.ndjson", dependencies=[Depends(flush_geometry)])
+async def export_user(user: str):
+    return StreamingResponse(
+        exports.export_user(user),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{user}.ndjson"'},
+    )
+
+async def _request_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+@router.post("/api/users/{user}/import.ndjson")
+async def import_user(user: str, request: Request, db: AsyncSession = Depends(get_session)):
+    try:
+        counts = await exports.import_user(db, user, _request_lines(request))
+    except InvalidImport as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"ok": True, "imported": counts}
+
 @router.get("/", response_class=HTMLResponse)
 async def root_page(request: Request):
     cached_user = request.cookies.get("smartnotes_user")
@@ -1,13 +1,36 @@
-from fastapi import APIRouter, Depends, Request
+import html
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_session
-from app.schemas.note import NewNoteIn, NewNoteOut, NotePatchIn
+from app.schemas.note import (
+    ArchivedNotesOut,
+    LocationIn,
+    LocationOut,
+    NewNoteIn,
+    NewNoteOut,
+    NewNotesIn,
+    NewNotesItemOut,
+    NewNotesOut,
+    NoteBodiesOut,
+    NoteBodyOut,
+    NotePatchIn,
+    NoteSearchHitOut,
+    NoteSearchOut,
+    NotesBatchPatchIn,
+)
+from app.repos.note_repo import SEARCH_HIGHLIGHT_START, SEARCH_HIGHLIGHT_STOP
 from app.services.board_service import BoardService
+from app.services.geometry_buffer import flush_geometry, geometry_buffer
+from app.services.llm_cache import llm_cache
 
 router = APIRouter()
 svc = BoardService()
 
+NOTE_BODIES_MAX_IDS = 200
+
 @router.post("/new_note", response_model=NewNoteOut)
 async def new_note(payload: NewNoteIn, request: Request, db: AsyncSession = Depends(get_session)):
     note = await svc.create_note(
@@ -25,18 +48,130 @@ async def new_note(payload: NewNoteIn, request: Request, db: AsyncSession = Depe
     url = str(request.url_for("board_page", user=payload.user)) + f"?focus_note_id={note.id}"
     return NewNoteOut(ok=True, note_id=note.id, url=url)
 
+@router.post("/new_notes", response_model=NewNotesOut)
+async def new_notes(payload: NewNotesIn, db: AsyncSession = Depends(get_session)):
+    items: list[NewNotesItemOut] = []
+    accepted: list[tuple[int, NewNoteIn]] = []
+    for index, raw in enumerate(payload.notes):
+        try:
+            accepted.append((index, NewNoteIn.model_validate(raw)))
+        except ValidationError as exc:
+            error = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            items.append(NewNotesItemOut(index=index, ok=False, error=error))
+
+    results = await svc.create_notes(
+        db,
+        [
+            {
+                "user_key": note.user,
+                "device": note.device,
+                "text": note.text,
+                "geo": (note.geo.model_dump() if note.geo else None),
+                "pos_x": note.pos_x,
+                "pos_y": note.pos_y,
+                "severity": note.severity,
+                "todo_list_id": note.todo_list_id,
+                "is_done": note.is_done,
+            }
+            for _, note in accepted
+        ],
+    )
+    for (index, _), (note_id, error) in zip(accepted, results):
+        items.append(NewNotesItemOut(index=index, ok=error is None, note_id=note_id, error=error))
+    items.sort(key=lambda x: x.index)
+    created = sum(1 for x in items if x.ok)
+    return NewNotesOut(ok=created == len(items), created=created, items=items)
+
+@router.patch("/api/notes:batch")
+async def patch_notes(payload: NotesBatchPatchIn, db: AsyncSession = Depends(get_session)):
+    items = {item.id: item.model_dump(exclude_unset=True, exclude={"id"}) for item in payload.items}
+    if all(geometry_buffer.accepts("note", fields) for fields in items.values()):
+        geometry_buffer.put("note", items)
+        return {"ok": True, "updated": len(items), "buffered": True}
+    await flush_geometry()
+    updated = await svc.patch_notes(db, items)
+    return {"ok": True, "updated": updated}
+
+@router.get("/api/notes", response_model=NoteBodiesOut)
+async def note_bodies(ids: str = Query(..., min_length=1), db: AsyncSession = Depends(get_session)):
+    try:
+        note_ids = sorted({int(v) for v in ids.split(",") if v.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not note_ids or len(note_ids) > NOTE_BODIES_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"ids must list 1 to {NOTE_BODIES_MAX_IDS} notes")
+    return NoteBodiesOut(items=await svc.note_bodies(db, note_ids))
+
+@router.get("/api/notes/{note_id}", response_model=NoteBodyOut)
+async def note_body(note_id: int, db: AsyncSession = Depends(get_session)):
+    rows = await svc.note_bodies(db, [note_id])
+    if not rows:
+        raise HTTPException(status_code=404, detail="note not found")
+    return rows[0]
+
 @router.patch("/api/notes/{note_id}")
 async def patch_note(note_id: int, payload: NotePatchIn, db: AsyncSession = Depends(get_session)):
-    await svc.patch_note(db, note_id, **payload.model_dump())
+    fields = payload.model_dump(exclude_unset=True)
+    if geometry_buffer.accepts("note", fields):
+        geometry_buffer.put("note", {note_id: fields})
+        return {"ok": True, "buffered": True}
+    await flush_geometry()
+    await svc.patch_note(db, note_id, **fields)
     return {"ok": True}
 
 @router.post("/api/users/{user}/process_notes_by_llm")
 async def process_notes(user: str, db: AsyncSession = Depends(get_session)):
-    processed = await svc.process_notes_by_llm(db, user)
-    return {"ok": True, "processed": processed}
+    job_id = await svc.enqueue_analysis(db, user)
+    return {"ok": True, "job_id": job_id}
+
+@router.get("/api/llm_jobs/{job_id}")
+async def llm_job_progress(job_id: str, db: AsyncSession = Depends(get_session)):
+    progress = await svc.analysis_progress(db, job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return progress
+
+@router.get("/api/llm_cache")
+async def llm_cache_stats():
+    return llm_cache.stats
+
+
+@router.get("/api/users/{user}/search", response_model=NoteSearchOut, dependencies=[Depends(flush_geometry)])
+async def search_notes(
+    user: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_session),
+):
+    rows, next_offset, fuzzy = await svc.search_notes(db, user, q, limit, offset)
+    items = [
+        NoteSearchHitOut(
+            **{k: v for k, v in row.items() if k != "headline"},
+            highlight=html.escape(row["headline"])
+            .replace(SEARCH_HIGHLIGHT_START, "<mark>")
+            .replace(SEARCH_HIGHLIGHT_STOP, "</mark>"),
+        )
+        for row in rows
+    ]
+    return NoteSearchOut(items=items, next_offset=next_offset, fuzzy=fuzzy)
+
+@router.get("/api/users/{user}/archive", response_model=ArchivedNotesOut)
+async def archived_notes(
+    user: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: int | None = Query(None, ge=1),
+    db: AsyncSession = Depends(get_session),
+):
+    items, next_before = await svc.list_archived_notes(db, user, before, limit)
+    return ArchivedNotesOut(items=items, next_before=next_before)
 
+@router.post("/api/users/{user}/location", response_model=LocationOut)
+async def report_location(user: str, payload: LocationIn, db: AsyncSession = Depends(get_session)):
+    inside, entered = await svc.report_location(db, user, payload.lat, payload.lon)
+    return LocationOut(inside=inside, entered=entered)
 
-@router.delete("/api/notes/{note_id}")
+@router.delete("/api/notes/{note_id}", dependencies=[Depends(flush_geometry)])
 async def delete_note(note_id: int, db: AsyncSession = Depends(get_session)):
     await svc.delete_note(db, note_id)
     return {"ok": True}
@@ -1,7 +1,10 @@
+from datetime import datetime
 from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from app.models.note import BOARD_COORD_LIMIT
+
 
 class GeoIn(BaseModel):
     model_config = ConfigDict(extra="forbid")
@@ -17,8 +20,8 @@ class NewNoteIn(BaseModel):
     device: Optional[str] = Field(None, max_length=200)
     text: str = Field(..., min_length=1, max_length=20000)
     geo: Optional[GeoIn] = None
-    pos_x: Optional[float] = None
-    pos_y: Optional[float] = None
+    pos_x: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
+    pos_y: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
     todo_list_id: Optional[int] = None
     severity: Optional[Literal["low", "normal", "high"]] = None
     is_done: Optional[bool] = None
@@ -30,12 +33,31 @@ class NewNoteOut(BaseModel):
     url: str
 
 
+class NewNotesIn(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    notes: list[dict[str, Any]] = Field(..., min_length=1, max_length=5000)
+
+
+class NewNotesItemOut(BaseModel):
+    index: int
+    ok: bool
+    note_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class NewNotesOut(BaseModel):
+    ok: bool
+    created: int
+    items: list[NewNotesItemOut]
+
+
 class NotePatchIn(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
     text: Optional[str] = Field(None, min_length=1, max_length=20000)
-    pos_x: Optional[float] = None
-    pos_y: Optional[float] = None
+    pos_x: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
+    pos_y: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
     todo_list_id: Optional[int] = None
     tag: Optional[str] = None
     severity: Optional[Literal["low", "normal", "high"]] = None
@@ -43,3 +65,75 @@ class NotePatchIn(BaseModel):
     notify_value: Optional[dict[str, Any]] = None
     is_processed_by_llm: Optional[bool] = None
     is_done: Optional[bool] = None
+
+
+class NoteBatchItemIn(NotePatchIn):
+    id: int
+
+
+class NotesBatchPatchIn(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: list[NoteBatchItemIn] = Field(..., min_length=1, max_length=5000)
+
+
+class LocationIn(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
+class GeofenceNoteOut(BaseModel):
+    id: int
+    text: str
+    distance_m: float
+
+
+class LocationOut(BaseModel):
+    inside: list[int]
+    entered: list[GeofenceNoteOut]
+
+
+class NoteSearchHitOut(BaseModel):
+    id: int
+    todo_list_id: Optional[int]
+    is_done: bool
+    pos_x: float
+    pos_y: float
+    rank: float
+    highlight: str
+
+
+class NoteSearchOut(BaseModel):
+    items: list[NoteSearchHitOut]
+    next_offset: Optional[int]
+    fuzzy: bool
+
+
+class NoteBodyOut(BaseModel):
+    id: int
+    text: str
+    text_hash: int
+    updated_at: datetime
+
+
+class NoteBodiesOut(BaseModel):
+    items: list[NoteBodyOut]
+
+
+class ArchivedNoteOut(BaseModel):
+    id: int
+    text: str
+    todo_list_id: Optional[int]
+    severity: str
+    tag: Optional[str]
+    device: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    archived_at: datetime
+
+
+class ArchivedNotesOut(BaseModel):
+    items: list[ArchivedNoteOut]
+    next_before: Optional[int]
@@ -2,6 +2,8 @@ from typing import Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from app.models.note import BOARD_COORD_LIMIT
+
 
 class TodoListOut(BaseModel):
     id: int
@@ -15,8 +17,18 @@ class TodoListOut(BaseModel):
 class TodoListPatchIn(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
-    pos_x: Optional[float] = None
-    pos_y: Optional[float] = None
-    width: Optional[float] = None
-    height: Optional[float] = None
+    pos_x: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
+    pos_y: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
+    width: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
+    height: Optional[float] = Field(None, allow_inf_nan=False, ge=-BOARD_COORD_LIMIT, le=BOARD_COORD_LIMIT)
     title: Optional[str] = Field(None, max_length=200)
+
+
+class TodoListBatchItemIn(TodoListPatchIn):
+    id: int
+
+
+class TodoListsBatchPatchIn(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: list[TodoListBatchItemIn] = Field(..., min_length=1, max_length=1000)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.db import SessionLocal
+from app.repos.analysis_job_repo import AnalysisJobRepo
+from app.services.board_service import BoardService
+from app.services.llm_cache import llm_cache, llm_cache_key
+from app.services.llm_service import LlmResult, LlmService
+from app.services.metrics import metrics
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_WRITE_BATCH = int(os.getenv("LLM_WRITE_BATCH", "50"))
+ANALYSIS_WORKER = os.getenv("ANALYSIS_WORKER", "1") == "1"
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", "1"))
+ANALYSIS_LEASE = timedelta(seconds=LLM_TIMEOUT_SECONDS * 2 + 30)
+ANALYSIS_BACKOFF_BASE = timedelta(seconds=float(os.getenv("ANALYSIS_BACKOFF_SECONDS", "10")))
+ANALYSIS_BACKOFF_MAX = timedelta(hours=1)
+ANALYSIS_DONE_RETENTION = timedelta(days=1)
+ANALYSIS_PRUNE_INTERVAL = 600
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisWorker:
+    def __init__(self) -> None:
+        self.board = BoardService()
+        self.jobs = AnalysisJobRepo()
+        self.llm = LlmService()
+        self.cache = llm_cache
+        self._semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        self._task: asyncio.Task | None = None
+        self._pruned_at = 0.0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+                await self._prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Analysis worker iteration failed")
+                claimed = 0
+            if not claimed:
+                await asyncio.sleep(ANALYSIS_POLL_SECONDS)
+
+    async def run_once(self) -> int:
+        async with SessionLocal() as db:
+            jobs = await self.jobs.claim(db, LLM_WRITE_BATCH, ANALYSIS_LEASE)
+            await db.commit()
+            if not jobs:
+                return 0
+            titles = await self.board.lists.titles_by_users(db, list({job["user_id"] for job in jobs}))
+            keys = [llm_cache_key(job["text"], titles[job["user_id"]]) for job in jobs]
+            cached = await self.cache.get_many(db, keys)
+
+        # Identical notes in one batch cost a single call.
+        texts = {key: job["text"] for job, key in zip(jobs, keys) if key not in cached}
+        outcomes = dict(zip(texts, await asyncio.gather(*(self._analyze(t) for t in texts.values()))))
+        fresh = {key: res for key, (res, _) in outcomes.items() if res is not None}
+
+        by_user: dict[int, list[tuple[dict, LlmResult]]] = {}
+        async with SessionLocal() as db:
+            await self.cache.put_many(db, fresh)
+            for job, key in zip(jobs, keys):
+                res, error = (cached[key], None) if key in cached else outcomes[key]
+                if res is not None:
+                    by_user.setdefault(job["user_id"], []).append((job, res))
+                    continue
+                logger.warning("Analysis of note %s failed (attempt %s): %s", job["note_id"], job["attempts"], error)
+                await self.jobs.fail(db, job["id"], error, self._retry_after(job["attempts"]))
+            await db.commit()
+
+            for user_id, done in by_user.items():
+                # Results and job completion land in one transaction, so a
+                # crash in between only means the lease expires and the
+                # note is analyzed again.
+                await self.jobs.complete(db, [job["id"] for job, _ in done])
+                await self.board.apply_llm_results(db, user_id, {job["note_id"]: res for job, res in done})
+                await db.commit()
+        return len(jobs)
+
+    async def _analyze(self, text: str) -> tuple[LlmResult | None, str | None]:
+        async with self._semaphore:
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                return await asyncio.wait_for(self.llm.analyze(text), LLM_TIMEOUT_SECONDS), None
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                return None, f"timed out after {LLM_TIMEOUT_SECONDS:g}s"
+            except Exception as exc:
+                outcome = "error"
+                return None, f"{type(exc).__name__}: {exc}"
+            finally:
+                metrics.llm_seconds.observe(time.perf_counter() - started, outcome)
+
+    @staticmethod
+    def _retry_after(attempts: int) -> timedelta | None:
+        if attempts >= LLM_MAX_ATTEMPTS:
+            return None
+        return min(ANALYSIS_BACKOFF_BASE * 2 ** (attempts - 1), ANALYSIS_BACKOFF_MAX)
+
+    async def _prune(self) -> None:
+        if time.monotonic() - self._pruned_at < ANALYSIS_PRUNE_INTERVAL:
+            return
+        self._pruned_at = time.monotonic()
+        async with SessionLocal() as db:
+            await self.jobs.prune_done(db, datetime.now(timezone.utc) - ANALYSIS_DONE_RETENTION)
+            await self.cache.prune(db)
+            await db.commit()
+
+
+analysis_worker = AnalysisWorker()
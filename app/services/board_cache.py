@@ -0,0 +1,101 @@
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import count
+
+from app.services.board_events import board_events
+
+BOARD_CACHE_MAX_BYTES = int(os.getenv("BOARD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+VERSION_PRUNE_SIZE = 10000
+
+
+@dataclass
+class CachedBoard:
+    user_id: int
+    body: bytes
+    etag: str
+
+
+def board_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class BoardCache:
+    def __init__(self, max_bytes: int = BOARD_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        # Keyed by (user_key, format): every representation of a board is
+        # cached and invalidated together.
+        self._entries: OrderedDict[tuple[str, str], CachedBoard] = OrderedDict()
+        self._keys_by_user: dict[int, set[tuple[str, str]]] = {}
+        self._bytes = 0
+        self._clock = count(1)
+        self._now = 0
+        self._floor = 0
+        self._versions: dict[int, int] = {}
+
+    def version(self) -> int:
+        return self._now
+
+    def get(self, user_key: str, fmt: str = "json") -> CachedBoard | None:
+        key = (user_key, fmt)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, user_key: str, user_id: int, body: bytes, version: int, fmt: str = "json") -> CachedBoard:
+        entry = CachedBoard(user_id=user_id, body=body, etag=board_etag(body))
+        # A write for this user landed while the payload was being built.
+        stale = version < self._floor or self._versions.get(user_id, 0) > version
+        if stale or len(body) > self.max_bytes:
+            return entry
+        key = (user_key, fmt)
+        self._drop(key)
+        self._entries[key] = entry
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+        return entry
+
+    def invalidate(self, user_id: int) -> None:
+        self._now = next(self._clock)
+        if len(self._versions) >= VERSION_PRUNE_SIZE:
+            # Raising the floor rejects every payload built before now, which
+            # is all the per-user versions were needed for.
+            self._versions = {}
+            self._floor = self._now
+        self._versions[user_id] = self._now
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._drop(key)
+
+    def clear(self) -> None:
+        self._now = next(self._clock)
+        self._entries.clear()
+        self._keys_by_user.clear()
+        self._bytes = 0
+        self._versions = {}
+        self._floor = self._now
+
+    def handle_event(self, event: dict) -> None:
+        if event["user_id"] is None:
+            self.clear()
+        else:
+            self.invalidate(event["user_id"])
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        keys = self._keys_by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry.user_id]
+
+
+board_cache = BoardCache()
+board_events.add_handler(board_cache.handle_event)
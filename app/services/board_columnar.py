@@ -0,0 +1,79 @@
+import json
+import math
+import struct
+import sys
+from array import array
+
+# Columnar board layout (little-endian):
+#   b"SNB1", uint32 header length, UTF-8 JSON header, then one section per
+#   header["columns"] entry, each starting on an 8-byte boundary so the page
+#   can view it as a typed array without copying.
+# The header carries the usual envelope (user, cursor, full, complete,
+# tile_size, lists, deleted), the note count, the string table and the
+# column list. String columns hold indexes into the table (-1 for null);
+# ids and list ids are float64 with NaN for null; the text previews are one
+# UTF-8 blob that the page decodes once and slices by the text_units UTF-16
+# lengths.
+COLUMNAR_MAGIC = b"SNB1"
+COLUMNAR_MEDIA_TYPE = "application/vnd.smartnotes.board+columnar"
+SEVERITIES = ("low", "normal", "high")
+NOTE_FLAGS = {"is_done": 1, "is_processed_by_llm": 2}
+
+NUMERIC_COLUMNS = (
+    ("id", "f64", "d"),
+    ("pos_x", "f64", "d"),
+    ("pos_y", "f64", "d"),
+    ("todo_list_id", "f64", "d"),
+    ("severity", "u8", "B"),
+    ("flags", "u8", "B"),
+    ("text_len", "u32", "I"),
+    ("text_hash", "u32", "I"),
+)
+STRING_COLUMNS = ("tag", "device", "notify_time")
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def _packed(typecode: str, values) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def encode_board(head: dict, lists_json: str, deleted: dict | None, columns: dict[str, list], count: int) -> bytes:
+    strings: dict[str, int] = {}
+    sections: list[tuple[dict, bytes]] = []
+    for name, kind, typecode in NUMERIC_COLUMNS:
+        values = columns[name]
+        if name == "todo_list_id":
+            values = [math.nan if v is None else v for v in values]
+        sections.append(({"name": name, "type": kind}, _packed(typecode, values)))
+    for name in STRING_COLUMNS:
+        indexes = [-1 if v is None else strings.setdefault(v, len(strings)) for v in columns[name]]
+        sections.append(({"name": name, "type": "i32"}, _packed("i", indexes)))
+    texts = columns["text"]
+    text_units = [len(t.encode("utf-16-le")) // 2 for t in texts]
+    sections.append(({"name": "text_units", "type": "u32"}, _packed("I", text_units)))
+    text = "".join(texts).encode()
+    sections.append(({"name": "text", "type": "utf8", "bytes": len(text)}, text))
+
+    header = {
+        **head,
+        "count": count,
+        "severities": SEVERITIES,
+        "flags": NOTE_FLAGS,
+        "strings": list(strings),
+        "columns": [meta for meta, _ in sections],
+    }
+    if deleted is not None:
+        header["deleted"] = deleted
+    header_json = json.dumps(header, ensure_ascii=False, separators=(",", ":"))
+    header_bytes = (header_json[:-1] + ',"lists":' + lists_json + "}").encode()
+    prefix = COLUMNAR_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes
+    parts = [prefix, _pad(len(prefix))]
+    for _, data in sections:
+        parts += [data, _pad(len(data))]
+    return b"".join(parts)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+
+import asyncpg
+from sqlalchemy import Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import DATABASE_LISTEN_URL
+
+BOARD_EVENTS_BACKEND = os.getenv("BOARD_EVENTS_BACKEND", "postgres")
+BOARD_EVENTS_CHANNEL = "board_events"
+MAX_EVENT_IDS = 200
+SUBSCRIBER_QUEUE_SIZE = 100
+
+NOTIFY_SQL = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload"
+).bindparams(bindparam("payloads", type_=ARRAY(Text)))
+
+logger = logging.getLogger(__name__)
+
+
+def board_event(user_id: int | None, entity: str, op: str, ids: list[int] | None) -> dict:
+    if ids is not None and len(ids) > MAX_EVENT_IDS:
+        ids = None
+    return {"user_id": user_id, "entity": entity, "op": op, "ids": ids}
+
+
+class BoardEventBus:
+    def __init__(self, backend: str = BOARD_EVENTS_BACKEND) -> None:
+        self.backend = backend
+        self.origin = uuid.uuid4().hex
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        self._handlers: list[Callable[[dict], None]] = []
+        self._listen_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self.backend == "postgres" and self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+
+    async def publish(self, db: AsyncSession, events: list[dict]) -> None:
+        if self.backend != "postgres" or not events:
+            return
+        payloads = [json.dumps({**e, "origin": self.origin}) for e in events]
+        await db.execute(NOTIFY_SQL, {"channel": BOARD_EVENTS_CHANNEL, "payloads": payloads})
+
+    def add_handler(self, handler: Callable[[dict], None]) -> None:
+        self._handlers.append(handler)
+
+    def remove_handler(self, handler: Callable[[dict], None]) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def dispatch(self, events: list[dict]) -> None:
+        for event in events:
+            for handler in self._handlers:
+                handler(event)
+            for queue in list(self._subscribers.get(event["user_id"], ())):
+                self._offer(queue, event)
+
+    def broadcast_resync(self) -> None:
+        for handler in self._handlers:
+            handler(board_event(None, "board", "resync", None))
+        for user_id, queues in list(self._subscribers.items()):
+            for queue in list(queues):
+                self._offer(queue, board_event(user_id, "board", "resync", None))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[user_id].discard(queue)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict) -> None:
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            event = board_event(event["user_id"], "board", "resync", None)
+        queue.put_nowait(event)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Dropping malformed board event: %r", payload)
+            return
+        if event.pop("origin", None) == self.origin:
+            return
+        self.dispatch([event])
+
+    async def _listen_forever(self) -> None:
+        dsn = make_url(DATABASE_LISTEN_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Board event listener could not connect; retrying")
+                await asyncio.sleep(1)
+                continue
+            lost = asyncio.get_running_loop().create_future()
+            connection.add_termination_listener(lambda _: lost.done() or lost.set_result(None))
+            try:
+                await connection.add_listener(BOARD_EVENTS_CHANNEL, self._on_notify)
+                # Anything published while we were disconnected is gone.
+                self.broadcast_resync()
+                await lost
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+            logger.warning("Board event listener lost its connection; reconnecting")
+            await asyncio.sleep(1)
+
+
+board_events = BoardEventBus()
@@ -1,11 +1,145 @@
+import math
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.note import Note
-from app.repos.note_repo import NoteRepo
+from app.models.note import GEOFENCE_CELL_DEG, Note
+from app.repos.analysis_job_repo import AnalysisJobRepo
+from app.repos.archived_note_repo import ArchivedNoteRepo
+from app.repos.note_repo import BOARD_NOTE_LIMIT, NoteRepo
 from app.repos.action_log_repo import ActionLogRepo
 from app.repos.todo_list_repo import TodoListRepo
+from app.repos.tombstone_repo import TombstoneRepo
 from app.repos.user_repo import UserRepo
-from app.services.llm_service import LlmService
+from app.services.board_events import board_event, board_events
+from app.services.llm_service import LlmResult
+from app.services.read_routing import read_router
+from app.services.user_cache import user_cache
+
+NOTE_SNAPSHOT_FIELDS = (
+    "id",
+    "user_id",
+    "device",
+    "text",
+    "geo",
+    "todo_list_id",
+    "pos_x",
+    "pos_y",
+    "is_processed_by_llm",
+    "notify_by",
+    "notify_value",
+    "severity",
+    "tag",
+    "is_done",
+    "meta",
+)
+
+NOTE_PATCH_FIELDS = NOTE_SNAPSHOT_FIELDS[2:]
+
+LIST_SNAPSHOT_FIELDS = ("id", "user_id", "title", "pos_x", "pos_y", "width", "height")
+LIST_PATCH_FIELDS = LIST_SNAPSHOT_FIELDS[2:]
+
+GEOFENCE_DEFAULT_RADIUS_M = float(os.getenv("GEOFENCE_DEFAULT_RADIUS_M", "150"))
+# A fence is only found from the neighbouring grid cells, so radii are
+# capped below the cell size.
+GEOFENCE_MAX_RADIUS_M = 2000.0
+# Leaving requires moving this much further out than entering, so a
+# device jittering on the boundary does not re-trigger the reminder.
+GEOFENCE_EXIT_FACTOR = 1.2
+LOCATION_LIMITS = {"lat": 90.0, "lon": 180.0, "radius_m": math.inf}
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+GEOMETRY_FIELDS = {"note": {"pos_x", "pos_y"}, "todo_list": {"pos_x", "pos_y", "width", "height"}}
+ACTION_COLLAPSE_WINDOW = timedelta(seconds=float(os.getenv("ACTION_LOG_COLLAPSE_SECONDS", "10")))
+ACTION_LOG_DEPTH = int(os.getenv("ACTION_LOG_DEPTH", "1000"))
+
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv("BOARD_TOMBSTONE_RETENTION_DAYS", "30")))
+# Done notes untouched for this many days move to archived_notes; 0 keeps them.
+NOTE_ARCHIVE_AFTER_DAYS = int(os.getenv("NOTE_ARCHIVE_AFTER_DAYS", "30"))
+NOTE_ARCHIVE_BATCH = 1000
+
+
+def parse_notify_at(value) -> datetime | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return at
+
+
+def format_notify_at(at: datetime) -> str:
+    return at.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def normalize_notify_value(notify_by: str | None, notify_value: dict | None) -> dict | None:
+    if not isinstance(notify_value, dict):
+        return notify_value
+    if notify_by == "time":
+        # Time reminders are stored as UTC ISO strings so that they compare
+        # correctly as text in the ix_notes_notify_at index.
+        at = parse_notify_at(notify_value.get("at"))
+        if at is None:
+            return notify_value
+        return {**notify_value, "at": format_notify_at(at)}
+    if notify_by == "location":
+        # The geofence cell columns cast lat/lon to float8 and the cell to
+        # integer; anything but a bounded number would make the write fail.
+        value = dict(notify_value)
+        for key, limit in LOCATION_LIMITS.items():
+            if key not in value:
+                continue
+            try:
+                number = None if isinstance(value[key], bool) else float(value[key])
+            except (TypeError, ValueError):
+                number = None
+            if number is None or not math.isfinite(number) or abs(number) > limit:
+                del value[key]
+            else:
+                value[key] = number
+        if "radius_m" in value:
+            value["radius_m"] = min(max(value["radius_m"], 1.0), GEOFENCE_MAX_RADIUS_M)
+        return value
+    return notify_value
+
+
+def geo_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _geofence(row: dict) -> tuple[float, float, float] | None:
+    value = row["notify_value"] if isinstance(row["notify_value"], dict) else {}
+    point = value if "lat" in value and "lon" in value else row["geo"]
+    if not isinstance(point, dict) or point.get("lat") is None or point.get("lon") is None:
+        return None
+    radius = min(float(value.get("radius_m") or GEOFENCE_DEFAULT_RADIUS_M), GEOFENCE_MAX_RADIUS_M)
+    return float(point["lat"]), float(point["lon"]), radius
+
+
+@dataclass
+class BoardState:
+    user_id: int
+    # Pre-rendered JSON arrays straight from Postgres; columnar reads get
+    # per-field note arrays instead of notes_json.
+    lists_json: str
+    cursor: datetime
+    notes_json: str | None = None
+    note_columns: dict[str, list] | None = None
+    note_count: int = 0
+    full: bool = True
+    complete: bool = False
+    deleted: dict[str, list[int]] | None = None
 
 
 class BoardService:
@@ -14,72 +148,140 @@ class BoardService:
         self.lists = TodoListRepo()
         self.notes = NoteRepo()
         self.actions = ActionLogRepo()
-        self.llm = LlmService()
+        self.tombstones = TombstoneRepo()
+        self.analysis = AnalysisJobRepo()
+        self.archive = ArchivedNoteRepo()
+        self._fuzzy_search: bool | None = None
 
     @staticmethod
-    def _note_snapshot(note: Note) -> dict:
-        return {
-            "id": note.id,
-            "user_id": note.user_id,
-            "device": note.device,
-            "text": note.text,
-            "geo": note.geo,
-            "todo_list_id": note.todo_list_id,
-            "pos_x": note.pos_x,
-            "pos_y": note.pos_y,
-            "is_processed_by_llm": note.is_processed_by_llm,
-            "notify_by": note.notify_by,
-            "notify_value": note.notify_value,
-            "severity": note.severity,
-            "tag": note.tag,
-            "is_done": note.is_done,
-            "meta": note.meta,
-        }
+    def _note_snapshot(note: Note | dict) -> dict:
+        if isinstance(note, dict):
+            return {k: note.get(k) for k in NOTE_SNAPSHOT_FIELDS}
+        return {k: getattr(note, k) for k in NOTE_SNAPSHOT_FIELDS}
 
     @staticmethod
     def _note_patch_fields(snapshot: dict) -> dict:
-        return {
-            "device": snapshot.get("device"),
-            "text": snapshot.get("text"),
-            "geo": snapshot.get("geo"),
-            "todo_list_id": snapshot.get("todo_list_id"),
-            "pos_x": snapshot.get("pos_x"),
-            "pos_y": snapshot.get("pos_y"),
-            "is_processed_by_llm": snapshot.get("is_processed_by_llm"),
-            "notify_by": snapshot.get("notify_by"),
-            "notify_value": snapshot.get("notify_value"),
-            "severity": snapshot.get("severity"),
-            "tag": snapshot.get("tag"),
-            "meta": snapshot.get("meta"),
-            "is_done": snapshot.get("is_done"),
-        }
+        return {k: snapshot[k] for k in NOTE_PATCH_FIELDS if k in snapshot}
 
     @staticmethod
     def _list_snapshot(todo_list) -> dict:
-        return {
-            "id": todo_list.id,
-            "user_id": todo_list.user_id,
-            "title": todo_list.title,
-            "pos_x": todo_list.pos_x,
-            "pos_y": todo_list.pos_y,
-            "width": todo_list.width,
-            "height": todo_list.height,
-        }
+        if isinstance(todo_list, dict):
+            return {k: todo_list.get(k) for k in LIST_SNAPSHOT_FIELDS}
+        return {k: getattr(todo_list, k) for k in LIST_SNAPSHOT_FIELDS}
 
     @staticmethod
     def _list_patch_fields(snapshot: dict) -> dict:
+        return {k: snapshot[k] for k in LIST_PATCH_FIELDS if k in snapshot}
+
+    @staticmethod
+    def _update_action(user_id: int, entity_type: str, before: dict, after: dict) -> dict | None:
+        # Updates keep only the fields that changed; create/delete actions
+        # keep full snapshots because undo has to rebuild the row.
+        changed = [k for k in after if k not in ("id", "user_id") and before.get(k) != after[k]]
+        if not changed:
+            return None
         return {
-            "title": snapshot.get("title"),
-            "pos_x": snapshot.get("pos_x"),
-            "pos_y": snapshot.get("pos_y"),
-            "width": snapshot.get("width"),
-            "height": snapshot.get("height"),
+            "user_id": user_id,
+            "action_type": "update",
+            "entity_type": entity_type,
+            "entity_id": after["id"],
+            "before": {k: before.get(k) for k in changed},
+            "after": {k: after[k] for k in changed},
         }
 
-    async def ensure_user_and_defaults(self, db: AsyncSession, user_key: str):
-        user = await self.users.get_or_create(db, user_key)
-        await self.lists.create_defaults_if_empty(db, user.id)
-        return user
+    async def _log_update(self, db: AsyncSession, user_id: int, entity_type: str, before: dict, after: dict) -> None:
+        action = self._update_action(user_id, entity_type, before, after)
+        if action is None:
+            return
+        geometry = GEOMETRY_FIELDS[entity_type]
+        if set(action["after"]) <= geometry:
+            last = await self.actions.get_head(db, user_id)
+            if (
+                last is not None
+                and last.action_type == "update"
+                and last.entity_type == entity_type
+                and last.entity_id == action["entity_id"]
+                and last.after
+                and set(last.after) <= geometry
+            ):
+                merged = await self.actions.merge_update(
+                    db,
+                    last.id,
+                    before={**action["before"], **(last.before or {})},
+                    after={**last.after, **action["after"]},
+                    window=ACTION_COLLAPSE_WINDOW,
+                )
+                if merged:
+                    return
+        await self.actions.create(db, **action)
+
+    async def _log_update_group(self, db: AsyncSession, user_id: int, entity_type: str, changes: list[tuple[dict, dict]]) -> None:
+        if len(changes) == 1:
+            await self._log_update(db, user_id, entity_type, *changes[0])
+            return
+        actions = [self._update_action(user_id, entity_type, before, after) for before, after in changes]
+        actions = [a for a in actions if a is not None]
+        if not actions:
+            return
+        # One entry for the whole batch so a single undo reverts all of it.
+        await self.actions.create(
+            db,
+            user_id=user_id,
+            action_type="update_many",
+            entity_type=entity_type,
+            entity_id=None,
+            before={"items": [{"id": a["entity_id"], **a["before"]} for a in actions]},
+            after={"items": [{"id": a["entity_id"], **a["after"]} for a in actions]},
+        )
+
+    async def _commit(self, db: AsyncSession, events: list[dict]) -> None:
+        await board_events.publish(db, events)
+        await db.commit()
+        board_events.dispatch(events)
+
+    async def ensure_user_and_defaults(self, db: AsyncSession, user_key: str) -> int:
+        cached = user_cache.get(user_key)
+        if cached is not None and cached[1]:
+            return cached[0]
+        if cached is not None:
+            user_id, created = cached[0], False
+        else:
+            user_id, created = await self.users.get_or_create_id(db, user_key)
+        created_defaults = await self.lists.create_defaults_if_empty(db, user_id)
+        # Rows inserted here may still roll back with the caller's transaction,
+        # so only state that was already committed is cached.
+        if not created:
+            user_cache.put(user_key, user_id, defaults_ensured=not created_defaults)
+        return user_id
+
+    @staticmethod
+    def _new_note_values(
+        user_id: int,
+        device: str | None,
+        text: str,
+        geo: dict | None,
+        pos_x: float | None = None,
+        pos_y: float | None = None,
+        severity: str | None = None,
+        todo_list_id: int | None = None,
+        is_done: bool | None = None,
+    ) -> dict:
+        return {
+            "user_id": user_id,
+            "device": device,
+            "text": text.strip(),
+            "geo": geo,
+            "todo_list_id": todo_list_id,
+            "pos_x": pos_x if pos_x is not None else 0,
+            "pos_y": pos_y if pos_y is not None else 0,
+            "severity": severity if severity in ("low", "normal", "high") else "normal",
+            "tag": None,
+            "is_processed_by_llm": False,
+            "notify_by": None,
+            "notify_value": None,
+            "is_done": bool(is_done) if is_done is not None else False,
+            "meta": {},
+        }
 
     async def create_note(
         self,
@@ -94,152 +296,434 @@ class BoardService:
         todo_list_id: int | None = None,
         is_done: bool | None = None,
     ) -> Note:
-        user = await self.ensure_user_and_defaults(db, user_key)
-        final_pos_x = pos_x if pos_x is not None else 0
-        final_pos_y = pos_y if pos_y is not None else 0
-        final_severity = severity if severity in ("low", "normal", "high") else "normal"
-        final_is_done = bool(is_done) if is_done is not None else False
+        user_id = await self.ensure_user_and_defaults(db, user_key)
         note = Note(
-            user_id=user.id,
-            device=device,
-            text=text.strip(),
-            geo=geo,
-            todo_list_id=todo_list_id,
-            pos_x=final_pos_x,
-            pos_y=final_pos_y,
-            severity=final_severity,
-            is_done=final_is_done,
+            **self._new_note_values(
+                user_id,
+                device=device,
+                text=text,
+                geo=geo,
+                pos_x=pos_x,
+                pos_y=pos_y,
+                severity=severity,
+                todo_list_id=todo_list_id,
+                is_done=is_done,
+            )
         )
         note = await self.notes.create(db, note)
-        await self.actions.clear_redo_for_user(db, user.id)
         await self.actions.create(
             db,
-            user_id=user.id,
+            user_id=user_id,
             action_type="create",
             entity_type="note",
             entity_id=note.id,
             before=None,
             after=self._note_snapshot(note),
         )
+        await self.analysis.enqueue(db, user_id, [note.id])
+        await self._commit(db, [board_event(user_id, "note", "upsert", [note.id])])
         return note
 
-    async def get_board(self, db: AsyncSession, user_key: str):
-        user = await self.ensure_user_and_defaults(db, user_key)
-        lists = await self.lists.list_by_user(db, user.id)
-        notes = await self.notes.list_by_user(db, user.id)
-        return user, lists, notes
+    async def create_notes(self, db: AsyncSession, items: list[dict]) -> list[tuple[int | None, str | None]]:
+        user_ids: dict[str, int] = {}
+        for item in items:
+            key = item["user_key"]
+            if key not in user_ids:
+                user_ids[key] = await self.ensure_user_and_defaults(db, key)
+        list_ids = await self.lists.ids_by_users(db, list(set(user_ids.values())))
+
+        results: list[tuple[int | None, str | None]] = [(None, None)] * len(items)
+        rows: list[dict] = []
+        positions: list[int] = []
+        for i, item in enumerate(items):
+            fields = dict(item)
+            user_id = user_ids[fields.pop("user_key")]
+            todo_list_id = fields.get("todo_list_id")
+            if todo_list_id is not None and todo_list_id not in list_ids[user_id]:
+                results[i] = (None, "unknown todo_list_id")
+                continue
+            rows.append(self._new_note_values(user_id, **fields))
+            positions.append(i)
+
+        created = await self.notes.create_many(db, rows)
+        await self.actions.create_many(
+            db,
+            [
+                {
+                    "user_id": row["user_id"],
+                    "action_type": "create",
+                    "entity_type": "note",
+                    "entity_id": row["id"],
+                    "before": None,
+                    "after": self._note_snapshot(row),
+                }
+                for row in created
+            ],
+        )
+        ids_by_user: dict[int, list[int]] = {}
+        for row in created:
+            ids_by_user.setdefault(row["user_id"], []).append(row["id"])
+        for user_id, ids in ids_by_user.items():
+            await self.analysis.enqueue(db, user_id, ids)
+        await self._commit(
+            db,
+            [board_event(user_id, "note", "upsert", ids) for user_id, ids in ids_by_user.items()],
+        )
+        for i, row in zip(positions, created):
+            results[i] = (row["id"], None)
+        return results
+
+    async def get_board(
+        self,
+        db: AsyncSession,
+        user_key: str,
+        since: datetime | None = None,
+        bbox: tuple[float, float, float, float] | None = None,
+        columnar: bool = False,
+    ) -> BoardState:
+        user_id = await self.ensure_user_and_defaults(db, user_key)
+        # The cursor bounds in-flight writes on the primary, so it is taken
+        # there; a replica only serves the rows once it has replayed that far.
+        cursor = await self.tombstones.sync_cursor(db)
+        lsn = await read_router.primary_lsn(db)
+        await db.commit()
+        if since is not None and since <= cursor - TOMBSTONE_RETENTION:
+            since = None
+        async with read_router.reader(db, user_id, lsn) as rdb:
+            if columnar:
+                note_columns, note_count = await self.notes.board_columns(rdb, user_id, since=since, bbox=bbox)
+                notes_json = None
+            else:
+                notes_json, note_count = await self.notes.board_json(rdb, user_id, since=since, bbox=bbox)
+                note_columns = None
+            lists_json, _ = await self.lists.board_json(rdb, user_id, since=since, bbox=bbox)
+            state = BoardState(
+                user_id=user_id,
+                lists_json=lists_json,
+                cursor=cursor,
+                notes_json=notes_json,
+                note_columns=note_columns,
+                note_count=note_count,
+                full=since is None and bbox is None,
+                complete=since is None and bbox is None and note_count < BOARD_NOTE_LIMIT,
+            )
+            if since is not None:
+                state.deleted = await self.tombstones.list_since(rdb, user_id, since)
+            await rdb.commit()
+        return state
+
+    async def resolve_user_id(self, db: AsyncSession, user_key: str) -> int:
+        user_id = await self.ensure_user_and_defaults(db, user_key)
+        await db.commit()
+        return user_id
+
+    async def prune_tombstones(self, db: AsyncSession) -> None:
+        cursor = await self.tombstones.sync_cursor(db)
+        await self.tombstones.prune(db, cursor - TOMBSTONE_RETENTION)
+        await db.commit()
+
+    async def compact_action_logs(self, db: AsyncSession) -> int:
+        removed = await self.actions.compact(db, ACTION_LOG_DEPTH)
+        await db.commit()
+        return removed
+
+    async def archive_done_notes(self, db: AsyncSession) -> int:
+        if NOTE_ARCHIVE_AFTER_DAYS <= 0:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=NOTE_ARCHIVE_AFTER_DAYS)
+        total = 0
+        while True:
+            moved = await self.archive.archive_done(db, cutoff, NOTE_ARCHIVE_BATCH)
+            by_user: dict[int, list[int]] = {}
+            for user_id, note_id in moved:
+                by_user.setdefault(user_id, []).append(note_id)
+            await self._commit(db, [board_event(user_id, "note", "delete", ids) for user_id, ids in by_user.items()])
+            total += len(moved)
+            if len(moved) < NOTE_ARCHIVE_BATCH:
+                return total
 
-    async def process_notes_by_llm(self, db: AsyncSession, user_key: str) -> int:
-        user = await self.ensure_user_and_defaults(db, user_key)
-        notes = await self.notes.list_by_user(db, user.id)
+    async def list_archived_notes(
+        self, db: AsyncSession, user_key: str, before: int | None, limit: int
+    ) -> tuple[list[dict], int | None]:
+        user_id = await self.ensure_user_and_defaults(db, user_key)
+        await db.commit()
+        async with read_router.reader(db, user_id) as rdb:
+            rows = await self.archive.page(rdb, user_id, before, limit + 1)
+            await rdb.commit()
+        next_before = rows[limit - 1]["id"] if len(rows) > limit else None
+        return rows[:limit], next_before
 
-        count = 0
-        lists = await self.lists.list_by_user(db, user.id)
+    async def enqueue_analysis(self, db: AsyncSession, user_key: str) -> str:
+        user_id = await self.ensure_user_and_defaults(db, user_key)
+        batch_id = uuid.uuid4().hex
+        note_ids = await self.notes.list_unprocessed_ids(db, user_id)
+        await self.analysis.enqueue(db, user_id, note_ids, batch_id=batch_id)
+        await db.commit()
+        return batch_id
+
+    async def search_notes(
+        self,
+        db: AsyncSession,
+        user_key: str,
+        query: str,
+        limit: int,
+        offset: int,
+    ) -> tuple[list[dict], int | None, bool]:
+        user_id = await self.ensure_user_and_defaults(db, user_key)
+        await db.commit()
+        async with read_router.reader(db, user_id) as rdb:
+            if self._fuzzy_search is None:
+                self._fuzzy_search = await self.notes.has_trigram_index(rdb)
+            rows = await self.notes.search(rdb, user_id, query, limit + 1, offset, self._fuzzy_search)
+            await rdb.commit()
+        next_offset = offset + limit if len(rows) > limit else None
+        return rows[:limit], next_offset, self._fuzzy_search
+
+    async def note_bodies(self, db: AsyncSession, note_ids: list[int]) -> list[dict]:
+        # Served from the primary: bodies are fetched right after edits.
+        rows = await self.notes.bodies(db, note_ids)
+        await db.commit()
+        return rows
+
+    async def analysis_progress(self, db: AsyncSession, batch_id: str) -> dict | None:
+        counts = await self.analysis.batch_counts(db, batch_id)
+        if not counts:
+            return None
+        active = counts.get("pending", 0) + counts.get("running", 0)
+        return {
+            "id": batch_id,
+            "status": "running" if active else "done",
+            "total": sum(counts.values()),
+            "processed": counts.get("done", 0),
+            "failed": counts.get("dead", 0),
+        }
+
+    async def apply_llm_results(self, db: AsyncSession, user_id: int, results: dict[int, LlmResult]) -> int:
+        if not results:
+            return 0
+        lists = await self.lists.list_by_user(db, user_id)
         title_to_id = {x.title.lower(): x.id for x in lists}
+        current = await self.notes.lock_many(
+            db, list(results), Note.todo_list_id, Note.severity, Note.tag, Note.notify_by
+        )
 
-        for n in notes:
-            if n.is_processed_by_llm:
+        # Analysis only fills in what the user left empty and only with what
+        # the model actually produced.
+        patches = {}
+        for note_id, res in results.items():
+            note = current.get(note_id)
+            if note is None:
                 continue
-            res = await self.llm.analyze(n.text)
+            patch = {"is_processed_by_llm": True}
+            todo_list_id = title_to_id.get(res.todo_list_title.lower()) if res.todo_list_title else None
+            if todo_list_id is not None and note["todo_list_id"] is None:
+                patch["todo_list_id"] = todo_list_id
+            if res.severity in ("low", "high") and note["severity"] == "normal":
+                patch["severity"] = res.severity
+            if res.tag and note["tag"] is None:
+                patch["tag"] = res.tag
+            if res.notify_by and res.notify_value and note["notify_by"] is None:
+                patch["notify_by"] = res.notify_by
+                patch["notify_value"] = normalize_notify_value(res.notify_by, res.notify_value)
+            patches[note_id] = patch
+        changed = await self.notes.patch_many(db, patches)
+        if not changed:
+            return 0
 
-            todo_list_id = None
-            if res.todo_list_title:
-                todo_list_id = title_to_id.get(res.todo_list_title.lower())
+        # Worker updates are not the user's actions: they stay out of the
+        # undo chain, so the first undo still reverts the user's last write.
+        note_ids = [after["id"] for _, after in changed]
+        await self._commit(db, [board_event(user_id, "note", "upsert", note_ids)])
+        return len(note_ids)
 
-            await self.patch_note(
-                db,
-                n.id,
-                todo_list_id=todo_list_id,
-                severity=res.severity,
-                tag=res.tag,
-                notify_by=res.notify_by,
-                notify_value=res.notify_value,
-                is_processed_by_llm=True,
-            )
-            count += 1
-        return count
+    async def fire_reminders(self, db: AsyncSession, note_ids: list[int]) -> list[dict]:
+        fired = await self.notes.claim_reminders(db, note_ids, format_notify_at(datetime.now(timezone.utc)))
+        ids_by_user: dict[int, list[int]] = {}
+        for row in fired:
+            ids_by_user.setdefault(row["user_id"], []).append(row["id"])
+        await self._commit(
+            db,
+            [board_event(user_id, "note", "notify", ids) for user_id, ids in ids_by_user.items()],
+        )
+        return fired
 
-    async def patch_note(self, db: AsyncSession, note_id: int, **fields) -> None:
-        note = await self.notes.get(db, note_id)
-        if not note:
-            return
-        before = self._note_snapshot(note)
-        await self.notes.patch(db, note_id, **fields)
-        updated = await self.notes.get(db, note_id)
-        if not updated:
-            return
-        await self.actions.clear_redo_for_user(db, note.user_id)
-        await self.actions.create(
+    async def report_location(self, db: AsyncSession, user_key: str, lat: float, lon: float) -> tuple[list[int], list[dict]]:
+        user_id = await self.ensure_user_and_defaults(db, user_key)
+        reach = GEOFENCE_MAX_RADIUS_M * GEOFENCE_EXIT_FACTOR
+        dlat = reach / METERS_PER_DEGREE
+        dlon = reach / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        rows = await self.notes.list_geofences(
             db,
-            user_id=note.user_id,
-            action_type="update",
-            entity_type="note",
-            entity_id=note_id,
-            before=before,
-            after=self._note_snapshot(updated),
+            user_id,
+            (math.floor((lat - dlat) / GEOFENCE_CELL_DEG), math.floor((lat + dlat) / GEOFENCE_CELL_DEG)),
+            (math.floor((lon - dlon) / GEOFENCE_CELL_DEG), math.floor((lon + dlon) / GEOFENCE_CELL_DEG)),
         )
 
+        inside: dict[int, tuple[dict, float]] = {}
+        keep: list[int] = []
+        for row in rows:
+            fence = _geofence(row)
+            if fence is None:
+                continue
+            distance = geo_distance_m(lat, lon, fence[0], fence[1])
+            if distance <= fence[2]:
+                inside[row["id"]] = (row, distance)
+            if distance <= fence[2] * GEOFENCE_EXIT_FACTOR:
+                keep.append(row["id"])
+
+        entered_ids = await self.notes.enter_geofences(db, user_id, list(inside))
+        await self.notes.leave_geofences(db, user_id, keep)
+        events = [board_event(user_id, "note", "notify", entered_ids)] if entered_ids else []
+        await self._commit(db, events)
+        entered = [
+            {"id": note_id, "text": inside[note_id][0]["text"], "distance_m": round(inside[note_id][1], 1)}
+            for note_id in entered_ids
+        ]
+        return list(inside), entered
+
+    async def patch_note(self, db: AsyncSession, note_id: int, **fields) -> None:
+        after = await self._patch_note(db, note_id, **fields)
+        if after is None:
+            return
+        await self._commit(db, [board_event(after["user_id"], "note", "upsert", [note_id])])
+
+    async def _normalize_notify(self, db: AsyncSession, items: dict[int, dict]) -> None:
+        # notify_value is normalized for the note's notify_by; when a patch
+        # carries only one of them the other is read from the locked row.
+        partial = [note_id for note_id, fields in items.items() if ("notify_by" in fields) != ("notify_value" in fields)]
+        current = await self.notes.lock_many(db, partial, Note.notify_by, Note.notify_value) if partial else {}
+        for note_id, fields in items.items():
+            if "notify_by" not in fields and "notify_value" not in fields:
+                continue
+            row = current.get(note_id, {})
+            notify_by = fields["notify_by"] if "notify_by" in fields else row.get("notify_by")
+            notify_value = fields["notify_value"] if "notify_value" in fields else row.get("notify_value")
+            fields["notify_value"] = normalize_notify_value(notify_by, notify_value)
+
+    async def _patch_note(self, db: AsyncSession, note_id: int, **fields) -> dict | None:
+        await self._normalize_notify(db, {note_id: fields})
+        result = await self.notes.patch(db, note_id, **fields)
+        if not result:
+            return None
+        before, after = result
+        await self._log_update(db, before["user_id"], "note", self._note_snapshot(before), self._note_snapshot(after))
+        return after
+
     async def delete_note(self, db: AsyncSession, note_id: int) -> None:
-        note = await self.notes.get(db, note_id)
-        if not note:
+        deleted = await self.notes.delete(db, note_id)
+        if not deleted:
             return
-        before = self._note_snapshot(note)
-        await self.notes.delete(db, note_id)
-        await self.actions.clear_redo_for_user(db, note.user_id)
         await self.actions.create(
             db,
-            user_id=note.user_id,
+            user_id=deleted["user_id"],
             action_type="delete",
             entity_type="note",
             entity_id=note_id,
-            before=before,
+            before=self._note_snapshot(deleted),
             after=None,
         )
+        await self._commit(db, [board_event(deleted["user_id"], "note", "delete", [note_id])])
 
     async def patch_todo_list(self, db: AsyncSession, list_id: int, **fields) -> None:
-        todo_list = await self.lists.get(db, list_id)
-        if not todo_list:
-            return
-        before = self._list_snapshot(todo_list)
-        await self.lists.patch(db, list_id, **fields)
-        updated = await self.lists.get(db, list_id)
-        if not updated:
+        result = await self.lists.patch(db, list_id, **fields)
+        if not result:
             return
-        await self.actions.clear_redo_for_user(db, todo_list.user_id)
-        await self.actions.create(
+        before, after = result
+        await self._log_update(db, before["user_id"], "todo_list", self._list_snapshot(before), self._list_snapshot(after))
+        await self._commit(db, [board_event(before["user_id"], "todo_list", "upsert", [list_id])])
+
+    async def patch_notes(self, db: AsyncSession, items: dict[int, dict]) -> int:
+        await self._normalize_notify(db, items)
+        changed = await self.notes.patch_many(db, items)
+        return await self._finish_batch(db, "note", changed, self._note_snapshot)
+
+    async def patch_todo_lists(self, db: AsyncSession, items: dict[int, dict]) -> int:
+        changed = await self.lists.patch_many(db, items)
+        return await self._finish_batch(db, "todo_list", changed, self._list_snapshot)
+
+    async def patch_geometry(self, db: AsyncSession, groups: list[tuple[str, dict[int, dict]]]) -> int:
+        # Write-behind flushes: every buffered request is one group and each
+        # row belongs to a single group. All rows land in one transaction
+        # with one UPDATE per entity type and field set, but each group is
+        # logged as its own undo step.
+        patches: dict[str, dict[int, dict]] = {"note": {}, "todo_list": {}}
+        for entity_type, rows in groups:
+            patches[entity_type].update(rows)
+        changed: dict[tuple[str, int], tuple[dict, dict]] = {}
+        for entity_type, repo in (("note", self.notes), ("todo_list", self.lists)):
+            if patches[entity_type]:
+                for before, after in await repo.patch_many(db, patches[entity_type]):
+                    changed[(entity_type, after["id"])] = (before, after)
+        snapshots = {"note": self._note_snapshot, "todo_list": self._list_snapshot}
+        ids_by_target: dict[tuple[int, str], list[int]] = {}
+        for entity_type, rows in groups:
+            group = [changed[(entity_type, row_id)] for row_id in rows if (entity_type, row_id) in changed]
+            await self._log_batch(db, entity_type, group, snapshots[entity_type])
+            for _, after in group:
+                ids_by_target.setdefault((after["user_id"], entity_type), []).append(after["id"])
+        await self._commit(
             db,
-            user_id=todo_list.user_id,
-            action_type="update",
-            entity_type="todo_list",
-            entity_id=list_id,
-            before=before,
-            after=self._list_snapshot(updated),
+            [board_event(user_id, entity_type, "upsert", ids) for (user_id, entity_type), ids in ids_by_target.items()],
         )
+        return len(changed)
+
+    async def _finish_batch(self, db: AsyncSession, entity_type: str, changed: list[tuple[dict, dict]], snapshot) -> int:
+        await self._commit(db, await self._log_batch(db, entity_type, changed, snapshot))
+        return len(changed)
+
+    async def _log_batch(self, db: AsyncSession, entity_type: str, changed: list[tuple[dict, dict]], snapshot) -> list[dict]:
+        by_user: dict[int, list[tuple[dict, dict]]] = {}
+        for before, after in changed:
+            by_user.setdefault(after["user_id"], []).append((snapshot(before), snapshot(after)))
+        for user_id, changes in by_user.items():
+            await self._log_update_group(db, user_id, entity_type, changes)
+        return [
+            board_event(user_id, entity_type, "upsert", [after["id"] for _, after in changes])
+            for user_id, changes in by_user.items()
+        ]
 
     async def undo_last_action(self, db: AsyncSession, user_key: str) -> bool:
-        user = await self.users.get_by_key(db, user_key)
+        user = await self.users.get_by_key(db, user_key, for_update=True)
         if not user:
             return False
-        action = await self.actions.get_last_undoable(db, user.id)
+        action = await self.actions.get(db, user.undo_head_id)
         if not action:
             return False
         await self._apply_action(db, action, reverse=True)
-        await self.actions.mark_undone(db, action.id)
+        await self.actions.mark_undone(db, action)
+        await self._commit(db, [self._action_event(action, reverse=True)])
         return True
 
     async def redo_last_action(self, db: AsyncSession, user_key: str) -> bool:
-        user = await self.users.get_by_key(db, user_key)
+        user = await self.users.get_by_key(db, user_key, for_update=True)
         if not user:
             return False
-        action = await self.actions.get_last_redoable(db, user.id)
+        action = await self.actions.get_redo(db, user.id, user.undo_head_id)
         if not action:
             return False
         await self._apply_action(db, action, reverse=False)
-        await self.actions.mark_redone(db, action.id)
+        await self.actions.mark_redone(db, action)
+        await self._commit(db, [self._action_event(action, reverse=False)])
         return True
 
+    @staticmethod
+    def _action_event(action, reverse: bool) -> dict:
+        removed = (action.action_type == "create" and reverse) or (action.action_type == "delete" and not reverse)
+        if action.action_type == "update_many":
+            ids = [item["id"] for item in (action.after or {}).get("items", [])]
+        else:
+            ids = [action.entity_id] if action.entity_id is not None else None
+        return board_event(action.user_id, action.entity_type, "delete" if removed else "upsert", ids)
+
     async def _apply_action(self, db: AsyncSession, action, reverse: bool) -> None:
         payload = action.before if reverse else action.after
+        if action.action_type == "update_many":
+            items = (payload or {}).get("items", [])
+            if action.entity_type == "note":
+                await self.notes.patch_many(db, {item["id"]: self._note_patch_fields(item) for item in items})
+            elif action.entity_type == "todo_list":
+                await self.lists.patch_many(db, {item["id"]: self._list_patch_fields(item) for item in items})
+            return
         if action.entity_type == "note":
             await self._apply_note_action(db, action.action_type, action.entity_id, payload, reverse)
         elif action.entity_type == "todo_list":
@@ -255,7 +739,9 @@ class BoardService:
                     existing = await self.notes.get(db, payload["id"])
                     if existing:
                         await self.notes.patch(db, payload["id"], **self._note_patch_fields(payload))
-                    else:
+                    elif not await self.archive.exists(db, payload["id"]):
+                        # An archived note keeps its id; recreating it would
+                        # put it in both tables.
                         await self.notes.create_from_snapshot(db, payload)
             return
         if action_type == "delete":
@@ -264,7 +750,7 @@ class BoardService:
                     existing = await self.notes.get(db, payload["id"])
                     if existing:
                         await self.notes.patch(db, payload["id"], **self._note_patch_fields(payload))
-                    else:
+                    elif not await self.archive.exists(db, payload["id"]):
                         await self.notes.create_from_snapshot(db, payload)
             else:
                 if entity_id is not None:
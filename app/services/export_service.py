@@ -0,0 +1,272 @@
+import json
+import math
+from collections.abc import AsyncIterator
+from datetime import date, datetime
+
+from asyncpg import PostgresError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import SessionLocal
+from app.models.action_log import ActionLog
+from app.models.archived_note import ArchivedNote
+from app.models.note import BOARD_COORD_LIMIT, Note
+from app.models.todo_list import TodoList
+from app.repos.action_log_repo import ActionLogRepo
+from app.repos.archived_note_repo import ArchivedNoteRepo
+from app.repos.copy_repo import CopyRepo
+from app.repos.note_repo import NoteRepo
+from app.repos.todo_list_repo import TodoListRepo
+from app.repos.user_repo import UserRepo
+from app.services.board_events import board_event, board_events
+from app.services.board_service import normalize_notify_value
+from app.services.read_routing import read_router
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_REFERENCES = {"note": ("todo_list_id",), "archived_note": ("todo_list_id",), "action_log": ("prev_id", "entity_id")}
+IMPORT_COORDINATES = {"todo_list": ("pos_x", "pos_y", "width", "height"), "note": ("pos_x", "pos_y")}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_line(kind: str, data: dict) -> str:
+    return json.dumps({"type": kind, "data": data}, default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _is_id(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_snapshot(value) -> bool:
+    if value is None:
+        return True
+    if not isinstance(value, dict):
+        return False
+    items = value.get("items", [])
+    return isinstance(items, list) and all(isinstance(item, dict) and _is_id(item.get("id")) for item in items)
+
+
+def _import_record(n: int, line: bytes) -> tuple[str | None, dict]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise InvalidImport(f"line {n}: not valid JSON")
+    if not isinstance(record, dict) or not isinstance(record.get("data"), dict):
+        raise InvalidImport(f'line {n}: expected {{"type": ..., "data": {{...}}}}')
+    kind, data = record.get("type"), record["data"]
+    if kind not in ("todo_list", "note", "archived_note", "action_log"):
+        return kind, data
+    if not _is_id(data.get("id")):
+        raise InvalidImport(f"line {n}: {kind} needs an integer id")
+    for key in IMPORT_REFERENCES.get(kind, ()):
+        if data.get(key) is not None and not _is_id(data[key]):
+            raise InvalidImport(f"line {n}: {key} must be an integer or null")
+    if kind == "action_log" and not (_is_snapshot(data.get("before")) and _is_snapshot(data.get("after"))):
+        raise InvalidImport(f"line {n}: before/after must be objects whose items have integer ids")
+    for key in IMPORT_COORDINATES.get(kind, ()):
+        value = data.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not abs(value) <= BOARD_COORD_LIMIT:
+            raise InvalidImport(f"line {n}: {key} must be a number within +/-{BOARD_COORD_LIMIT:g}")
+    if kind in ("note", "archived_note"):
+        data["notify_value"] = normalize_notify_value(data.get("notify_by"), data.get("notify_value"))
+    return kind, data
+
+
+def _rejected_by_copy(exc: Exception) -> bool:
+    # Values COPY can't encode, and data or constraint errors from the
+    # server (SQLSTATE classes 22 and 23), are the file's fault.
+    if isinstance(exc, (ValueError, TypeError)):
+        return True
+    return isinstance(exc, PostgresError) and (exc.sqlstate or "")[:2] in ("22", "23")
+
+
+def _entity_ids(action: dict):
+    if action.get("entity_id") is not None:
+        yield action["entity_id"]
+    for snapshot in (action.get("before"), action.get("after")):
+        for item in (snapshot or {}).get("items", []):
+            yield item["id"]
+
+
+class ExportService:
+    def __init__(self) -> None:
+        self.users = UserRepo()
+        self.lists = TodoListRepo()
+        self.notes = NoteRepo()
+        self.actions = ActionLogRepo()
+        self.archive = ArchivedNoteRepo()
+        self.copy = CopyRepo()
+
+    async def export_user(self, user_key: str) -> AsyncIterator[str]:
+        async with SessionLocal() as db:
+            user = await self.users.get_by_key(db, user_key)
+            if not user:
+                return
+            lsn = await read_router.primary_lsn(db)
+            await db.commit()
+            db.expunge(user)
+            async with read_router.reader(db, user.id, lsn) as rdb:
+                # The user row and every table are read from one snapshot,
+                # so references between exported rows always resolve.
+                await rdb.commit()
+                await rdb.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                user = await self.users.get_by_key(rdb, user_key)
+                if not user:
+                    return
+                yield _ndjson_line(
+                    "user",
+                    {"user_key": user.user_key, "created_at": user.created_at, "undo_head_id": user.undo_head_id},
+                )
+                for kind, repo in (
+                    ("todo_list", self.lists),
+                    ("note", self.notes),
+                    ("archived_note", self.archive),
+                    ("action_log", self.actions),
+                ):
+                    result = await repo.stream_by_user(rdb, user.id)
+                    async for partition in result.mappings().partitions():
+                        yield "".join(_ndjson_line(kind, dict(row)) for row in partition)
+
+    async def import_user(self, db: AsyncSession, user_key: str, lines: AsyncIterator[bytes]) -> dict[str, int]:
+        user_id, _ = await self.users.get_or_create_id(db, user_key)
+        state = _ImportState(user_id=user_id)
+        buffers: dict[str, list[tuple[int, dict]]] = {"todo_list": [], "note": [], "archived_note": [], "action_log": []}
+        n = 0
+        async for line in lines:
+            n += 1
+            if not line.strip():
+                continue
+            kind, data = _import_record(n, line)
+            if kind == "user" and "undo_head_id" in data:
+                if data["undo_head_id"] is not None and not _is_id(data["undo_head_id"]):
+                    raise InvalidImport(f"line {n}: undo_head_id must be an integer or null")
+                state.exported_head = True
+                state.undo_head_id = data["undo_head_id"]
+            if kind not in buffers:
+                continue
+            # Lists, notes, archived notes and action logs are exported in that
+            # order; flushing everything before a later kind keeps the id maps
+            # complete.
+            for earlier in buffers:
+                if earlier == kind:
+                    break
+                await self._flush(db, state, earlier, buffers[earlier])
+            buffers[kind].append((n, data))
+            if len(buffers[kind]) >= IMPORT_BATCH_SIZE:
+                await self._flush(db, state, kind, buffers[kind])
+        for kind, rows in buffers.items():
+            await self._flush(db, state, kind, rows)
+        if state.exported_head:
+            head_id = state.action_ids.get(state.undo_head_id)
+        else:
+            head_id = state.last_applied_id
+        await self.actions.set_head(db, user_id, head_id)
+
+        events = [board_event(user_id, "board", "resync", None)]
+        await board_events.publish(db, events)
+        await db.commit()
+        board_events.dispatch(events)
+        return state.counts
+
+    async def _flush(self, db: AsyncSession, state: "_ImportState", kind: str, lines: list[tuple[int, dict]]) -> None:
+        if not lines:
+            return
+        rows = [row for _, row in lines]
+        if kind == "todo_list":
+            table, id_map = TodoList.__table__, state.list_ids
+        elif kind == "note":
+            table, id_map = Note.__table__, state.note_ids
+        elif kind == "archived_note":
+            table, id_map = ArchivedNote.__table__, state.note_ids
+        else:
+            table, id_map = ActionLog.__table__, state.action_ids
+
+        if kind == "action_log":
+            await self._reserve_missing_entity_ids(db, state, rows)
+        # Archived notes keep ids from the notes sequence.
+        id_table = Note.__table__ if kind == "archived_note" else table
+        new_ids = await self.copy.reserve_ids(db, id_table, len(rows))
+        prepared = []
+        for row, new_id in zip(rows, new_ids):
+            id_map[row["id"]] = new_id
+            prepared.append(state.remap(kind, {**row, "id": new_id}))
+        try:
+            await self.copy.copy_rows(db, table, prepared)
+        except Exception as exc:
+            if not _rejected_by_copy(exc):
+                raise
+            raise InvalidImport(f"lines {lines[0][0]}-{lines[-1][0]}: {kind} rows rejected: {exc}") from exc
+        state.counts[kind] += len(rows)
+        lines.clear()
+
+    async def _reserve_missing_entity_ids(self, db: AsyncSession, state: "_ImportState", rows: list[dict]) -> None:
+        # Entities that were deleted before the export only live on in the
+        # action log; give them fresh ids so undo cannot collide with rows
+        # already present in this database.
+        for entity_type, table, id_map in (
+            ("note", Note.__table__, state.note_ids),
+            ("todo_list", TodoList.__table__, state.list_ids),
+        ):
+            missing = {
+                entity_id
+                for row in rows
+                if row.get("entity_type") == entity_type
+                for entity_id in _entity_ids(row)
+                if entity_id not in id_map
+            }
+            if not missing:
+                continue
+            for old_id, new_id in zip(missing, await self.copy.reserve_ids(db, table, len(missing))):
+                id_map[old_id] = new_id
+
+
+class _ImportState:
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+        self.list_ids: dict[int, int] = {}
+        self.note_ids: dict[int, int] = {}
+        self.action_ids: dict[int, int] = {}
+        self.exported_head = False
+        self.undo_head_id: int | None = None
+        self.last_id: int | None = None
+        self.last_applied_id: int | None = None
+        self.counts = {"todo_list": 0, "note": 0, "archived_note": 0, "action_log": 0}
+
+    def remap(self, kind: str, row: dict) -> dict:
+        row["user_id"] = self.user_id
+        if kind in ("note", "archived_note"):
+            row["todo_list_id"] = self.list_ids.get(row.get("todo_list_id"))
+        elif kind == "action_log":
+            id_map = self.note_ids if row.get("entity_type") == "note" else self.list_ids
+            row["entity_id"] = id_map.get(row.get("entity_id"))
+            row["before"] = self._remap_snapshot(row.get("before"), id_map)
+            row["after"] = self._remap_snapshot(row.get("after"), id_map)
+            # Exports without undo links replay as one linear history.
+            row["prev_id"] = self.action_ids.get(row["prev_id"]) if "prev_id" in row else self.last_id
+            self.last_id = row["id"]
+            if row.get("undone_at") is None:
+                self.last_applied_id = row["id"]
+        return row
+
+    def _remap_snapshot(self, snapshot: dict | None, id_map: dict[int, int]) -> dict | None:
+        if not snapshot:
+            return snapshot
+        snapshot = dict(snapshot)
+        if "items" in snapshot:
+            snapshot["items"] = [self._remap_snapshot(item, id_map) for item in snapshot["items"]]
+        if "id" in snapshot:
+            snapshot["id"] = id_map.get(snapshot["id"], snapshot["id"])
+        if "user_id" in snapshot:
+            snapshot["user_id"] = self.user_id
+        if snapshot.get("todo_list_id") is not None:
+            snapshot["todo_list_id"] = self.list_ids.get(snapshot["todo_list_id"])
+        return snapshot
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from app.db import SessionLocal
+from app.services.board_service import BoardService
+
+GEOMETRY_WRITE_BEHIND = os.getenv("GEOMETRY_WRITE_BEHIND", "0") == "1"
+GEOMETRY_FLUSH_SECONDS = float(os.getenv("GEOMETRY_FLUSH_MS", "250")) / 1000
+GEOMETRY_FIELDS = {
+    "note": frozenset({"pos_x", "pos_y"}),
+    "todo_list": frozenset({"pos_x", "pos_y", "width", "height"}),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _rejected(exc: BaseException) -> bool:
+    # The server refused the statement (a bad value, a constraint), as
+    # opposed to a lost connection or an unreachable database.
+    return (
+        isinstance(exc, DBAPIError)
+        and not exc.connection_invalidated
+        and not isinstance(exc, (OperationalError, InterfaceError))
+    )
+
+
+# Dragging sends a stream of position-only patches. With write-behind on they
+# are acknowledged at once and every GEOMETRY_FLUSH_MS the buffer lands in one
+# transaction. Each buffered request stays one undo step; a row patched by
+# several requests in one window keeps only its latest geometry. Reads served
+# by this process flush first, so they never see older positions than the
+# client was told were saved. The buffer is per process: other workers only
+# see the moves once they are flushed.
+class GeometryBuffer:
+    def __init__(self) -> None:
+        self.board = BoardService()
+        self.enabled = False
+        self._pending: list[tuple[str, dict[int, dict]]] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending)
+
+    def accepts(self, entity_type: str, fields: dict) -> bool:
+        return (
+            self.enabled
+            and bool(fields)
+            and fields.keys() <= GEOMETRY_FIELDS[entity_type]
+            and all(v is not None for v in fields.values())
+        )
+
+    def put(self, entity_type: str, rows: dict[int, dict]) -> None:
+        self._pending.append((entity_type, {row_id: dict(fields) for row_id, fields in rows.items()}))
+        self._wake.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self.enabled = True
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        self.enabled = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final geometry flush failed")
+
+    async def run_forever(self) -> None:
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(GEOMETRY_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Geometry flush failed")
+                await asyncio.sleep(1)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            groups = self._collapse(self._pending)
+            self._pending = []
+            try:
+                await self._apply(groups)
+            except BaseException as exc:
+                if not _rejected(exc):
+                    self._requeue(groups)
+                    raise
+                logger.warning("Geometry flush failed, retrying request by request", exc_info=True)
+                await self._apply_each(groups)
+
+    async def _apply(self, groups: list[tuple[str, dict[int, dict]]]) -> None:
+        async with SessionLocal() as db:
+            await self.board.patch_geometry(db, groups)
+
+    async def _apply_each(self, groups: list[tuple[str, dict[int, dict]]]) -> None:
+        # Rows the database rejects are dropped so they can't hold back the
+        # rest of the buffer; anything else is kept for the next flush.
+        for i, group in enumerate(groups):
+            try:
+                await self._apply([group])
+            except BaseException as exc:
+                if not _rejected(exc):
+                    self._requeue(groups[i:])
+                    raise
+                logger.exception("Dropping buffered %s geometry for ids %s", group[0], sorted(group[1]))
+
+    def _requeue(self, groups: list[tuple[str, dict[int, dict]]]) -> None:
+        self._pending[:0] = groups
+        self._wake.set()
+
+    @staticmethod
+    def _collapse(requests: list[tuple[str, dict[int, dict]]]) -> list[tuple[str, dict[int, dict]]]:
+        # Each row ends up in the last request that touched it, with the
+        # fields of all its requests merged in order.
+        merged: dict[tuple[str, int], dict] = {}
+        for entity_type, rows in requests:
+            for row_id, fields in rows.items():
+                merged.setdefault((entity_type, row_id), {}).update(fields)
+        claimed: set[tuple[str, int]] = set()
+        groups = []
+        for entity_type, rows in reversed(requests):
+            keys = [(entity_type, row_id) for row_id in rows if (entity_type, row_id) not in claimed]
+            claimed.update(keys)
+            if keys:
+                groups.append((entity_type, {row_id: merged[(entity_type, row_id)] for _, row_id in keys}))
+        groups.reverse()
+        return groups
+
+
+geometry_buffer = GeometryBuffer()
+
+
+async def flush_geometry() -> None:
+    if geometry_buffer.pending:
+        await geometry_buffer.flush()
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repos.llm_cache_repo import LlmCacheRepo
+from app.services.llm_service import LlmResult
+
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "10000"))
+LLM_CACHE_TTL = timedelta(days=float(os.getenv("LLM_CACHE_TTL_DAYS", "30")))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def llm_cache_key(text: str, list_titles: list[str]) -> str:
+    titles = sorted({normalize_text(t) for t in list_titles})
+    payload = "\x1f".join([normalize_text(text), *titles])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LlmCache:
+    def __init__(self, max_entries: int = LLM_CACHE_MEMORY_ENTRIES, ttl: timedelta = LLM_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.repo = LlmCacheRepo()
+        self._memory: OrderedDict[str, tuple[float, LlmResult]] = OrderedDict()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    async def get_many(self, db: AsyncSession, keys: list[str]) -> dict[str, LlmResult]:
+        found: dict[str, LlmResult] = {}
+        missing: list[str] = []
+        for key in dict.fromkeys(keys):
+            entry = self._memory.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                missing.append(key)
+                continue
+            self._memory.move_to_end(key)
+            found[key] = entry[1]
+        self.stats["memory_hits"] += len(found)
+
+        stored = await self.repo.get_many(db, missing)
+        for key, data in stored.items():
+            res = LlmResult(**data)
+            self._remember(key, res)
+            found[key] = res
+        self.stats["db_hits"] += len(stored)
+        self.stats["misses"] += len(missing) - len(stored)
+        return found
+
+    async def put_many(self, db: AsyncSession, results: dict[str, LlmResult]) -> None:
+        for key, res in results.items():
+            self._remember(key, res)
+        await self.repo.put_many(db, {key: asdict(res) for key, res in results.items()}, self.ttl)
+
+    async def prune(self, db: AsyncSession) -> None:
+        await self.repo.prune(db)
+
+    def _remember(self, key: str, res: LlmResult) -> None:
+        self._memory[key] = (time.monotonic() + self.ttl.total_seconds(), res)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+llm_cache = LlmCache()
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import os
+
+from app.db import SessionLocal
+from app.services.board_service import BoardService
+
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "600"))
+
+logger = logging.getLogger(__name__)
+
+
+class Maintenance:
+    def __init__(self) -> None:
+        self.board = BoardService()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Board maintenance failed")
+            await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+    async def run_once(self) -> None:
+        async with SessionLocal() as db:
+            await self.board.prune_tombstones(db)
+            removed = await self.board.compact_action_logs(db)
+            archived = await self.board.archive_done_notes(db)
+        if removed:
+            logger.info("Compacted %s action log entries", removed)
+        if archived:
+            logger.info("Archived %s done notes", archived)
+
+
+maintenance = Maintenance()
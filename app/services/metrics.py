@@ -0,0 +1,231 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_MAX_CHARS = 2000
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(labels: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{k}="{_label_value(v)}"' for k, v in zip(labels, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_series(self.labels, values)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum.
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in sorted(self._values.items()):
+            running = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                running += count
+                le = 'le="' + (bound if bound == "+Inf" else f"{bound:g}") + '"'
+                lines.append(f"{self.name}_bucket{_series(self.labels, values, le)} {running}")
+            lines.append(f"{self.name}_sum{_series(self.labels, values)} {total[0]:g}")
+            lines.append(f"{self.name}_count{_series(self.labels, values)} {running}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, read: Callable[[], float | None]) -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        value = self.read()
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value:g}"]
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "HTTP request latency.", LATENCY_BUCKETS, ("method", "route", "status")
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries", "SQL statements executed per HTTP request.", QUERY_COUNT_BUCKETS, ("route",)
+        )
+        self.request_query_seconds = Histogram(
+            "http_request_db_seconds", "Time spent in SQL per HTTP request.", LATENCY_BUCKETS, ("route",)
+        )
+        self.query_seconds = Histogram("db_query_duration_seconds", "SQL statement latency.", LATENCY_BUCKETS)
+        self.slow_queries = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.")
+        self.pool_wait_seconds = Histogram(
+            "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", LATENCY_BUCKETS
+        )
+        self.llm_seconds = Histogram("llm_call_duration_seconds", "LLM analysis call latency.", LLM_BUCKETS, ("outcome",))
+        self._collectors: list = [
+            self.request_seconds,
+            self.request_queries,
+            self.request_query_seconds,
+            self.query_seconds,
+            self.slow_queries,
+            self.pool_wait_seconds,
+            self.llm_seconds,
+        ]
+        self._query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+    def add_collector(self, collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+    def begin_request(self):
+        return self._query_stats.set(QueryStats())
+
+    def end_request(self, token) -> QueryStats:
+        stats = self._query_stats.get()
+        self._query_stats.reset(token)
+        return stats
+
+    def instrument_engine(self, engine: AsyncEngine) -> None:
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self._handle_error)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @staticmethod
+    def _handle_error(context) -> None:
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        self.query_seconds.observe(elapsed)
+        stats = self._query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            self.slow_queries.inc()
+            slow_query_logger.warning(
+                "slow query %.1fms params=%s: %s",
+                elapsed * 1000,
+                parameter_shape(parameters, executemany),
+                " ".join(statement.split())[:SLOW_QUERY_MAX_CHARS],
+            )
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    # Types only: parameter values may hold note text or locations.
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)}x{parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        shown = [
+            f"{type(v).__name__}[{len(v)}]" if isinstance(v, (list, tuple)) else type(v).__name__
+            for v in parameters[:20]
+        ]
+        if len(parameters) > 20:
+            shown.append(f"+{len(parameters) - 20}")
+        return "(" + ", ".join(shown) + ")"
+    return type(parameters).__name__
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    k == b"content-type" and v.startswith(b"text/event-stream") for k, v in message.get("headers", ())
+                )
+            await send(message)
+
+        token = self.metrics.begin_request()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stats = self.metrics.end_request(token)
+            # Server-sent event streams stay open for as long as the board
+            # tab does; their duration says nothing about latency.
+            if not streaming:
+                route = scope.get("route")
+                label = getattr(route, "path", None) or "unmatched"
+                self.metrics.request_seconds.observe(time.perf_counter() - started, scope["method"], label, status)
+                self.metrics.request_queries.observe(stats.count, label)
+                self.metrics.request_query_seconds.observe(stats.seconds, label)
+
+
+metrics = Metrics()
@@ -0,0 +1,76 @@
+import os
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import Text, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import DATABASE_READ_URL, ReadSessionLocal
+from app.services.board_events import board_events
+from app.services.metrics import Counter, metrics
+
+# How long a user's reads stay on the primary after one of their writes;
+# should comfortably exceed replica lag.
+DB_READ_STICKY_SECONDS = float(os.getenv("DB_READ_STICKY_SECONDS", "10"))
+STICKY_PRUNE_SIZE = 10000
+
+PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+# NULL when the "replica" is really a primary, which is always caught up.
+REPLICA_CAUGHT_UP_SQL = text(
+    "SELECT coalesce(pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), true)"
+).bindparams(bindparam("lsn", type_=Text))
+
+
+# Board events are published for every committed write, in this process and
+# (over LISTEN/NOTIFY) in all others, so they double as the signal that a
+# user's replica reads may be stale.
+class ReadRouter:
+    def __init__(self, sticky_seconds: float = DB_READ_STICKY_SECONDS) -> None:
+        self.sticky_seconds = sticky_seconds
+        self._sticky_until: dict[int, float] = {}
+        self._all_sticky_until = 0.0
+        self.routed = Counter("db_read_routing_total", "Read-only requests by the database that served them.", ("target",))
+        metrics.add_collector(self.routed)
+
+    @property
+    def enabled(self) -> bool:
+        return DATABASE_READ_URL is not None
+
+    def is_sticky(self, user_id: int) -> bool:
+        now = time.monotonic()
+        return now < self._all_sticky_until or now < self._sticky_until.get(user_id, 0.0)
+
+    async def primary_lsn(self, db: AsyncSession) -> str | None:
+        if not self.enabled:
+            return None
+        return (await db.execute(PRIMARY_LSN_SQL)).scalar_one()
+
+    @asynccontextmanager
+    async def reader(self, db: AsyncSession, user_id: int, lsn: str | None = None):
+        # `db` is the caller's primary session and the fallback. With `lsn`
+        # the replica is only used once it has replayed the primary up to it.
+        if not self.enabled or self.is_sticky(user_id):
+            self.routed.inc("primary")
+            yield db
+            return
+        async with ReadSessionLocal() as replica:
+            if lsn is None or (await replica.execute(REPLICA_CAUGHT_UP_SQL, {"lsn": lsn})).scalar_one():
+                self.routed.inc("replica")
+                yield replica
+                return
+        self.routed.inc("primary_lagging")
+        yield db
+
+    def handle_event(self, event: dict) -> None:
+        until = time.monotonic() + self.sticky_seconds
+        if event["user_id"] is None:
+            self._all_sticky_until = until
+            return
+        self._sticky_until[event["user_id"]] = until
+        if len(self._sticky_until) > STICKY_PRUNE_SIZE:
+            now = time.monotonic()
+            self._sticky_until = {k: v for k, v in self._sticky_until.items() if v > now}
+
+
+read_router = ReadRouter()
+board_events.add_handler(read_router.handle_event)
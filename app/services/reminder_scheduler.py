@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.db import SessionLocal
+from app.services.board_events import board_events
+from app.services.board_service import BoardService, format_notify_at, parse_notify_at
+
+REMINDER_SCHEDULER = os.getenv("REMINDER_SCHEDULER", "1") == "1"
+REMINDER_HORIZON = timedelta(seconds=float(os.getenv("REMINDER_HORIZON_SECONDS", "300")))
+REMINDER_LOOKBACK = timedelta(seconds=float(os.getenv("REMINDER_LOOKBACK_SECONDS", "86400")))
+REMINDER_MAX_LOADED = int(os.getenv("REMINDER_MAX_LOADED", "100000"))
+REMINDER_FIRE_BATCH = 500
+
+logger = logging.getLogger(__name__)
+
+
+# Every process keeps the reminders due within the horizon in a heap and
+# sleeps until the next one. Firing is claimed in Postgres, so a reminder
+# fires exactly once however many schedulers loaded it.
+class ReminderScheduler:
+    def __init__(self) -> None:
+        self.board = BoardService()
+        self._heap: list[tuple[float, int, str]] = []
+        self._pending: dict[int, str] = {}
+        self._loaded_until: datetime | None = None
+        self._dirty: set[int] = set()
+        self._reload_requested = True
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._reload_requested = True
+            board_events.add_handler(self._on_event)
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        board_events.remove_handler(self._on_event)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._dirty.clear()
+
+    async def run_forever(self) -> None:
+        while True:
+            # Cleared before the tick so events that arrive during it still
+            # wake the next wait.
+            self._wake.clear()
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder scheduler iteration failed")
+                self._reload_requested = True
+                await asyncio.sleep(1)
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._seconds_until_next())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _tick(self) -> None:
+        now = datetime.now(timezone.utc)
+        if self._reload_requested or self._loaded_until is None or now + REMINDER_HORIZON / 2 >= self._loaded_until:
+            await self._reload(now)
+        if self._dirty:
+            await self._refresh()
+        await self._fire_due()
+
+    async def _reload(self, now: datetime) -> None:
+        self._reload_requested = False
+        self._dirty.clear()
+        until = now + REMINDER_HORIZON
+        async with SessionLocal() as db:
+            rows = await self.board.notes.list_pending_reminders(
+                db, format_notify_at(now - REMINDER_LOOKBACK), format_notify_at(until), REMINDER_MAX_LOADED
+            )
+        if len(rows) == REMINDER_MAX_LOADED:
+            # Only part of the window fit; pick up the rest once these fire.
+            until = parse_notify_at(rows[-1]["at"]) or now
+        self._heap = []
+        self._pending = {}
+        for row in rows:
+            self._schedule(row["id"], row["at"])
+        self._loaded_until = until
+
+    async def _refresh(self) -> None:
+        note_ids = list(self._dirty)
+        self._dirty.clear()
+        for note_id in note_ids:
+            self._pending.pop(note_id, None)
+        async with SessionLocal() as db:
+            rows = await self.board.notes.get_pending_reminders(db, note_ids)
+        oldest = datetime.now(timezone.utc) - REMINDER_LOOKBACK
+        for row in rows:
+            at = parse_notify_at(row["at"])
+            if at is not None and oldest <= at < self._loaded_until:
+                self._schedule(row["id"], row["at"])
+
+    async def _fire_due(self) -> None:
+        now = time.time()
+        due: list[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, note_id, at = heapq.heappop(self._heap)
+            if self._pending.get(note_id) == at:
+                del self._pending[note_id]
+                due.append(note_id)
+        for i in range(0, len(due), REMINDER_FIRE_BATCH):
+            async with SessionLocal() as db:
+                fired = await self.board.fire_reminders(db, due[i:i + REMINDER_FIRE_BATCH])
+            for row in fired:
+                logger.info("Reminder for note %s (user %s) fired for %s", row["id"], row["user_id"], row["at"])
+
+    def _schedule(self, note_id: int, at_text: str) -> None:
+        at = parse_notify_at(at_text)
+        if at is None:
+            return
+        self._pending[note_id] = at_text
+        heapq.heappush(self._heap, (at.timestamp(), note_id, at_text))
+
+    def _seconds_until_next(self) -> float:
+        reload_in = (self._loaded_until - datetime.now(timezone.utc) - REMINDER_HORIZON / 2).total_seconds()
+        if self._heap:
+            return max(0.0, min(self._heap[0][0] - time.time(), reload_in))
+        return max(0.0, reload_in)
+
+    def _on_event(self, event: dict) -> None:
+        if event["entity"] == "note" and event["op"] == "notify":
+            return
+        if event["entity"] in ("note", "board") and event["ids"] is None:
+            self._reload_requested = True
+        elif event["entity"] == "note":
+            self._dirty.update(event["ids"])
+        else:
+            return
+        self._wake.set()
+
+
+reminder_scheduler = ReminderScheduler()
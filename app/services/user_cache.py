@@ -0,0 +1,35 @@
+import os
+import time
+from collections import OrderedDict
+
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+
+
+class UserCache:
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES, ttl: float = USER_CACHE_TTL_SECONDS) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, int, bool]] = OrderedDict()
+
+    def get(self, user_key: str) -> tuple[int, bool] | None:
+        entry = self._entries.get(user_key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[user_key]
+            return None
+        self._entries.move_to_end(user_key)
+        return entry[1], entry[2]
+
+    def put(self, user_key: str, user_id: int, defaults_ensured: bool) -> None:
+        self._entries[user_key] = (time.monotonic() + self.ttl, user_id, defaults_ensured)
+        self._entries.move_to_end(user_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+user_cache = UserCache()
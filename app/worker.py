@@ -0,0 +1,13 @@
+import asyncio
+import logging
+
+from app.services.analysis_worker import analysis_worker
+
+
+async def main() -> None:
+    await analysis_worker.run_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+SQL_TOLERANCE = 0.1
+METRICS = (("p50", True), ("p95", True), ("p99", True), ("throughput_rps", False), ("sql_per_request", True))
+
+
+def load(path: Path) -> dict[tuple[str, str], dict]:
+    report = json.loads(path.read_text())
+    return {(r["size"], r["scenario"]): r for r in report["results"]}
+
+
+def metric(result: dict, name: str) -> float:
+    return result["latency_ms"][name] if name in result["latency_ms"] else result[name]
+
+
+def compare(base: dict, head: dict, threshold: float) -> list[str]:
+    regressions = []
+    header = f"{'size':>5} {'scenario':<11} " + " ".join(f"{name:>22}" for name, _ in METRICS)
+    print(header)
+    for key in sorted(base.keys() & head.keys()):
+        cells = []
+        for name, lower_is_better in METRICS:
+            old, new = metric(base[key], name), metric(head[key], name)
+            change = (new - old) / old if old else 0.0
+            worse = change > threshold if lower_is_better else change < -threshold
+            # Statement counts barely vary between runs, so any real increase counts.
+            if name == "sql_per_request":
+                worse = new - old > SQL_TOLERANCE
+            if worse:
+                regressions.append(f"{key[0]} {key[1]} {name}: {old:g} -> {new:g}")
+            cells.append(f"{old:>8.2f} -> {new:>8.2f}{'!' if worse else ' '}")
+        print(f"{key[0]:>5} {key[1]:<11} " + " ".join(f"{c:>22}" for c in cells))
+    for key in sorted(base.keys() ^ head.keys()):
+        print(f"{key[0]:>5} {key[1]:<11} only in {'base' if key in base else 'head'}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base", type=Path)
+    parser.add_argument("head", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default 0.10)")
+    args = parser.parse_args(argv)
+    regressions = compare(load(args.base), load(args.head), args.threshold)
+    for line in regressions:
+        print(f"regression: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
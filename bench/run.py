@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Background workers would add their own queries to the statement counts.
+os.environ.setdefault("ANALYSIS_WORKER", "0")
+os.environ.setdefault("REMINDER_SCHEDULER", "0")
+os.environ.setdefault("BOARD_EVENTS_BACKEND", "local")
+
+import httpx
+from sqlalchemy import event, text
+
+from app.db import SessionLocal, engine
+from app.main import app
+from app.services.board_cache import board_cache
+from app.services.user_cache import user_cache
+from bench.seed import SIZES, WORDS, bench_user_key, load_user, note_text, seed_user
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+async def new_note(client: httpx.AsyncClient, ctx: dict, rnd: random.Random, i: int) -> httpx.Response:
+    payload = {"user": ctx["user_key"], "text": note_text(rnd), "pos_x": rnd.uniform(0, 5000), "pos_y": rnd.uniform(0, 5000)}
+    return await client.post("/new_note", json=payload)
+
+
+async def board(client: httpx.AsyncClient, ctx: dict, rnd: random.Random, i: int) -> httpx.Response:
+    return await client.get(f"/api/board/{ctx['user_key']}")
+
+
+async def board_bbox(client: httpx.AsyncClient, ctx: dict, rnd: random.Random, i: int) -> httpx.Response:
+    x, y = rnd.uniform(0, 10000), rnd.uniform(0, 10000)
+    return await client.get(f"/api/board/{ctx['user_key']}", params={"bbox": f"{x},{y},{x + 1920},{y + 1080}"})
+
+
+async def patch_note(client: httpx.AsyncClient, ctx: dict, rnd: random.Random, i: int) -> httpx.Response:
+    note_id = rnd.choice(ctx["note_ids"])
+    return await client.patch(f"/api/notes/{note_id}", json={"pos_x": rnd.uniform(0, 5000), "pos_y": rnd.uniform(0, 5000)})
+
+
+async def undo_redo(client: httpx.AsyncClient, ctx: dict, rnd: random.Random, i: int) -> httpx.Response:
+    op = "undo" if i % 2 == 0 else "redo"
+    return await client.post(f"/api/users/{ctx['user_key']}/{op}")
+
+
+async def search(client: httpx.AsyncClient, ctx: dict, rnd: random.Random, i: int) -> httpx.Response:
+    return await client.get(f"/api/users/{ctx['user_key']}/search", params={"q": rnd.choice(WORDS), "limit": 20})
+
+
+SCENARIOS = {
+    "new_note": new_note,
+    "board": board,
+    "board_bbox": board_bbox,
+    "patch_note": patch_note,
+    "undo_redo": undo_redo,
+    "search": search,
+}
+
+
+class StatementCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+
+@asynccontextmanager
+async def lifespan(asgi_app):
+    inbox: asyncio.Queue = asyncio.Queue()
+    outbox: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(asgi_app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, inbox.get, outbox.put))
+    await inbox.put({"type": "lifespan.startup"})
+    message = await outbox.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"app startup failed: {message.get('message')}")
+    try:
+        yield
+    finally:
+        await inbox.put({"type": "lifespan.shutdown"})
+        await outbox.get()
+        await task
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    ctx: dict,
+    counter: StatementCounter,
+    concurrency: int,
+    duration: float,
+    warmup: int,
+    seed: int,
+) -> dict:
+    scenario = SCENARIOS[name]
+    warm = random.Random(seed)
+    for i in range(warmup):
+        await scenario(client, ctx, warm, i)
+
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker(n: int) -> None:
+        nonlocal errors
+        rnd = random.Random(seed * 1000 + n)
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await scenario(client, ctx, rnd, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            i += 1
+
+    statements = counter.count
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    statements = counter.count - statements
+
+    ordered = sorted(latencies)
+    return {
+        "scenario": name,
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered), 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p95": round(percentile(ordered, 0.95), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0,
+        },
+        "sql_per_request": round(statements / len(ordered), 2) if ordered else 0.0,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+async def main(args: argparse.Namespace) -> dict:
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    scenarios = list(SCENARIOS) if args.scenarios == "all" else [s.strip() for s in args.scenarios.split(",")]
+    for name in sizes:
+        if name not in SIZES:
+            raise SystemExit(f"unknown size {name!r}; choose from {', '.join(SIZES)}")
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    results = []
+    async with lifespan(app):
+        async with SessionLocal() as db:
+            server_version = (await db.execute(text("SHOW server_version"))).scalar()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for size in sizes:
+                user_key = bench_user_key(size)
+                for name in scenarios:
+                    # Writes change the dataset, so every scenario starts from
+                    # the same seeded state unless --reuse is given.
+                    async with SessionLocal() as db:
+                        ctx = await load_user(db, user_key) if args.reuse else None
+                        if ctx is None:
+                            started = time.perf_counter()
+                            ctx = await seed_user(db, user_key, SIZES[size], seed=args.seed)
+                            print(f"seeded {user_key} in {time.perf_counter() - started:.1f}s", flush=True)
+                    user_cache.clear()
+                    board_cache.clear()
+                    result = await run_scenario(
+                        client, name, ctx, counter, args.concurrency, args.duration, args.warmup, args.seed
+                    )
+                    result["size"] = size
+                    results.append(result)
+                    lat = result["latency_ms"]
+                    print(
+                        f"{size:>5} {name:<11} {result['throughput_rps']:>9.1f} rps"
+                        f"  p50 {lat['p50']:>8.2f}  p95 {lat['p95']:>8.2f}  p99 {lat['p99']:>8.2f} ms"
+                        f"  sql/req {result['sql_per_request']:>5.2f}  errors {result['errors']}",
+                        flush=True,
+                    )
+    event.remove(engine.sync_engine, "before_cursor_execute", counter)
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the notes API in-process against DATABASE_URL.")
+    parser.add_argument("--sizes", default="1k,10k", help=f"comma-separated dataset sizes ({', '.join(SIZES)})")
+    parser.add_argument("--scenarios", default="all", help=f"comma-separated scenarios ({', '.join(SCENARIOS)}) or all")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reuse", action="store_true", help="keep an already seeded user instead of reseeding")
+    parser.add_argument("--out", type=Path, help="result file (default bench/results/<timestamp>.json)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    out = args.out or RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"wrote {out}")
@@ -0,0 +1,124 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.action_log import ActionLog
+from app.models.note import Note
+from app.models.todo_list import TodoList
+from app.models.user import User
+from app.repos.action_log_repo import ActionLogRepo
+from app.repos.copy_repo import CopyRepo
+from app.repos.user_repo import UserRepo
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+FRAMES_PER_USER = 12
+HISTORY_DEPTH = 1000
+NOTE_SPACING = 300
+WORDS = (
+    "купить молоко хлеб позвонить маме встреча проект отчёт сдать задача дедлайн счёт "
+    "оплатить врач записаться ремонт машина подарок billing deploy server release review "
+    "meeting report invoice backup migrate refactor"
+).split()
+
+
+def bench_user_key(size: str) -> str:
+    return f"bench-{size}"
+
+
+def note_text(rnd: random.Random) -> str:
+    return " ".join(rnd.choices(WORDS, k=rnd.randint(3, 24)))
+
+
+async def seed_user(db: AsyncSession, user_key: str, n_notes: int, seed: int = 1) -> dict:
+    rnd = random.Random(f"{user_key}:{n_notes}:{seed}")
+    copy = CopyRepo()
+    now = datetime.now(timezone.utc)
+
+    old_id = (await db.execute(select(User.id).where(User.user_key == user_key))).scalar_one_or_none()
+    if old_id is not None:
+        # Row deletes leave tombstones; removing the user last clears them too.
+        await db.execute(delete(Note).where(Note.user_id == old_id))
+        await db.execute(delete(TodoList).where(TodoList.user_id == old_id))
+        await db.execute(delete(User).where(User.id == old_id))
+    user_id, _ = await UserRepo().get_or_create_id(db, user_key)
+
+    side = math.ceil(math.sqrt(n_notes)) * NOTE_SPACING
+    list_ids = await copy.reserve_ids(db, TodoList.__table__, FRAMES_PER_USER)
+    await copy.copy_rows(
+        db,
+        TodoList.__table__,
+        [
+            {
+                "id": list_id,
+                "user_id": user_id,
+                "title": f"Frame {i}",
+                "pos_x": (i % 4) * side / 4,
+                "pos_y": (i // 4) * side / 3,
+                "width": 520,
+                "height": 360,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i, list_id in enumerate(list_ids)
+        ],
+    )
+
+    note_ids = await copy.reserve_ids(db, Note.__table__, n_notes)
+    notes = []
+    for i, note_id in enumerate(note_ids):
+        created = now - timedelta(seconds=n_notes - i)
+        notes.append(
+            {
+                "id": note_id,
+                "user_id": user_id,
+                "text": note_text(rnd),
+                "todo_list_id": rnd.choice(list_ids) if rnd.random() < 0.3 else None,
+                "pos_x": rnd.uniform(0, side),
+                "pos_y": rnd.uniform(0, side),
+                "is_processed_by_llm": True,
+                "severity": rnd.choice(("low", "normal", "normal", "high")),
+                "is_done": rnd.random() < 0.2,
+                "meta": {},
+                "created_at": created,
+                "updated_at": created,
+            }
+        )
+    await copy.copy_rows(db, Note.__table__, notes)
+
+    # A full undo history of drags, spaced past the collapse window.
+    depth = min(HISTORY_DEPTH, n_notes)
+    action_ids = await copy.reserve_ids(db, ActionLog.__table__, depth)
+    actions = []
+    prev_id = None
+    for i, action_id in enumerate(action_ids):
+        note = rnd.choice(notes)
+        actions.append(
+            {
+                "id": action_id,
+                "user_id": user_id,
+                "prev_id": prev_id,
+                "action_type": "update",
+                "entity_type": "note",
+                "entity_id": note["id"],
+                "before": {"pos_x": note["pos_x"], "pos_y": note["pos_y"]},
+                "after": {"pos_x": note["pos_x"], "pos_y": note["pos_y"]},
+                "created_at": now - timedelta(minutes=depth - i),
+            }
+        )
+        prev_id = action_id
+    await copy.copy_rows(db, ActionLog.__table__, actions)
+    await ActionLogRepo().set_head(db, user_id, prev_id)
+    await db.commit()
+    return {"user_key": user_key, "user_id": user_id, "note_ids": note_ids, "list_ids": list_ids}
+
+
+async def load_user(db: AsyncSession, user_key: str) -> dict | None:
+    user_id = (await db.execute(select(User.id).where(User.user_key == user_key))).scalar_one_or_none()
+    if user_id is None:
+        return None
+    note_ids = (await db.execute(select(Note.id).where(Note.user_id == user_id).order_by(Note.id))).scalars().all()
+    list_ids = (await db.execute(select(TodoList.id).where(TodoList.user_id == user_id).order_by(TodoList.id))).scalars().all()
+    return {"user_key": user_key, "user_id": user_id, "note_ids": list(note_ids), "list_ids": list(list_ids)}